@@ -3,13 +3,108 @@ import sys
 import re
 import collections
 import argparse
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import multiprocessing
+import os
 from os import path
 
 
 PARSER_FUNC_PREFIX = 'parse_line_'
 PRINTER_FUNC_PREFIX = 'print_stats_'
+RGX_PARENTHESES = re.compile(r'[(].*[)]')
+RGX_YEAR = re.compile(r".*(\d{4}).*")
+RGX_CENTURY = re.compile(r".*(\d{2}).*century")
 COMPOSER_MODE = 'composer'
 CENTURY_MODE = 'century'
+GENRE_MODE = 'genre'
+KEY_MODE = 'key'
+EDITION_MODE = 'edition'
+#field name (text before the first colon) aggregated by each mode
+MODE_FIELDS = collections.OrderedDict([
+  (COMPOSER_MODE, 'Composer'),
+  (CENTURY_MODE, 'Composition Year'),
+  (GENRE_MODE, 'Genre'),
+  (KEY_MODE, 'Key'),
+  (EDITION_MODE, 'Edition'),
+])
+#modes which can be limited to the most frequent values
+TOP_MODES = (COMPOSER_MODE,)
+DEFAULT_TOP_ERROR = 0.001
+
+
+class SpaceSaving:
+  """
+  This is a class representing Space-Saving sketch of the most frequent keys.
+
+  At most capacity counters are kept, so memory does not depend on number of
+  distinct keys. A counter of a new key replaces the smallest one and inherits
+  its count, therefore each count may be overestimated by at most
+  total / capacity. The same holds when sketches are merged by update.
+
+  Attributes:
+    top (int): Number of keys reported by most_common.
+    capacity (int): Maximal number of kept counters.
+    counts (dict): Estimated counts of kept keys.
+    total (int): Number of all counted occurrences.
+  """
+  def __init__(self, top, error=DEFAULT_TOP_ERROR):
+    """
+    The constructor for SpaceSaving class.
+
+    Parameters:
+      top (int): Number of keys reported by most_common.
+      error (float): Maximal overestimation of count relative to total.
+    """
+    self.top = top
+    self.capacity = max(top, math.ceil(1 / error))
+    self.counts = {}
+    self.total = 0
+    #min-heap of (count, key), entries may hold outdated lower counts
+    self.heap = []
+
+  def add(self, key, count=1):
+    "This method counts count occurrences of key"
+    self.total += count
+    counts = self.counts
+    if key in counts:
+      counts[key] += count
+      return
+    if len(counts) < self.capacity:
+      counts[key] = count
+      heapq.heappush(self.heap, (count, key))
+      return
+
+    #find the smallest counter, refresh outdated heap entries on the way
+    while True:
+      smallest, evicted = self.heap[0]
+      if counts[evicted] == smallest:
+        break
+      heapq.heapreplace(self.heap, (counts[evicted], evicted))
+    del counts[evicted]
+    counts[key] = smallest + count
+    heapq.heapreplace(self.heap, (smallest + count, key))
+
+  def update(self, keys):
+    "This method counts keys from iterable or merges counts from mapping"
+    if hasattr(keys, "items"):
+      for key, count in keys.items():
+        self.add(key, count)
+    else:
+      for key in keys:
+        self.add(key)
+
+  def items(self):
+    "This method returns kept keys with their estimated counts"
+    return self.counts.items()
+
+  def most_common(self):
+    "This method returns top keys ordered by estimated count"
+    return heapq.nlargest(self.top, self.counts.items(),
+                          key=lambda item: item[1])
 
 
 def eprint(*args, **kwargs):
@@ -21,75 +116,298 @@ def parse_args():
   "This function parses command-line arguments and does basic checks"
   parser = argparse.ArgumentParser()
   parser.add_argument("filename", help="source file")
-  parser.add_argument("mode", help="statistics mode of aggregation "
-                                   "(supported modes: composer, century)")
+  parser.add_argument("mode", nargs="+",
+                      help="statistics mode of aggregation, several modes "
+                           "are computed in a single pass "
+                           "(supported modes: %s)" % ", ".join(MODE_FIELDS))
+  parser.add_argument("-j", "--jobs", type=int, default=1,
+                      help="number of worker processes parsing file chunks")
+  parser.add_argument("-s", "--state",
+                      help="file with persisted statistics, only data "
+                           "appended since the previous run are parsed")
+  parser.add_argument("-k", "--top", type=int,
+                      help="print only top K values of %s mode, counted in "
+                           "constant memory by Space-Saving sketch"
+                           % ", ".join(TOP_MODES))
+  parser.add_argument("-e", "--error", type=float, default=DEFAULT_TOP_ERROR,
+                      help="maximal count overestimation of top mode "
+                           "relative to number of values (default: %(default)s)")
   args = parser.parse_args()
 
   if not path.isfile(args.filename):
     eprint("Filename doesn't refer to a valid file")
     exit(2)
-  if args.mode not in (COMPOSER_MODE, CENTURY_MODE):
-    eprint("Statistic mode %s is not supported" % args.mode)
+  if args.jobs < 1:
+    eprint("Number of jobs must be positive")
+    exit(2)
+  if args.top is not None and args.top < 1:
+    eprint("Number of top values must be positive")
     exit(2)
+  if not 0 < args.error < 1:
+    eprint("Error bound must be between 0 and 1")
+    exit(2)
+  for mode in args.mode:
+    if mode not in MODE_FIELDS:
+      eprint("Statistic mode %s is not supported" % mode)
+      exit(2)
+
+  #keep the order given by user, drop duplicates
+  modes = list(collections.OrderedDict.fromkeys(args.mode))
+  sketch = (args.top, args.error) if args.top is not None else None
+  return args.filename, modes, args.jobs, args.state, sketch
+
+
+def new_counter(mode, sketch=None):
+  """
+  This function creates counter for statistic mode
+
+  Parameter sketch is tuple (top, error) of SpaceSaving or None for Counter.
+  """
+  if sketch is not None and mode in TOP_MODES:
+    return SpaceSaving(*sketch)
+  return collections.Counter()
+
+
+def build_dispatch(modes, stats, sketch=None):
+  """
+  This function prepares dispatch table for requested modes
+
+  Returns: dict mapping encoded field name to list of (parser, counter) pairs
+  """
+  dispatch = {}
+  for mode in modes:
+    stats[mode] = new_counter(mode, sketch)
+    dispatch.setdefault(MODE_FIELDS[mode].encode("utf-8"), []).append(
+      (globals()[PARSER_FUNC_PREFIX + mode], stats[mode]))
+
+  return dispatch
+
+
+def find_chunks(filename, count, start=0, end=None):
+  """
+  This function splits file into byte ranges on line boundaries
+
+  Lines are counted one by one, so a chunk may start at any line, whatever
+  its line ending (LF or CRLF) is.
+
+  Returns: list of (start, end) tuples covering the given range of file
+  """
+  end = path.getsize(filename) if end is None else end
+  size = end - start
+  if count < 2 or size <= 0:
+    return [(start, end)]
+
+  bounds = [start]
+  with open(filename, 'rb') as file:
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+      for idx in range(1, count):
+        pos = data.find(b"\n", max(start + size * idx // count, bounds[-1]),
+                        end)
+        if pos == -1:
+          break
+        if pos + 1 > bounds[-1]:
+          bounds.append(pos + 1)
+
+  if bounds[-1] < end:
+    bounds.append(end)
+  return list(zip(bounds, bounds[1:]))
+
 
-  return args.filename, args.mode
+def scan_file(filename, dispatch, start=0, end=None):
+  """
+  This function scans byte range of memory-mapped file for dispatched fields
 
+  The range is read in a single pass by one regular expression matching lines
+  of all dispatched fields, lines of other fields are skipped on raw bytes
+  without decoding. Only values of dispatched fields are decoded and passed
+  to their parsers.
+  """
+  if path.getsize(filename) == 0:
+    return
 
-def parse_file(filename, mode, stats):
-  "This function parses source file with data"
-  stats[mode] = collections.Counter()
+  rgx_fields = re.compile(b"^(" + b"|".join(map(re.escape, dispatch))
+                          + b"):([^\n]*)", re.MULTILINE)
+  with open(filename, 'rb') as file:
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+      end = len(data) if end is None else end
+      for match in rgx_fields.finditer(data, start, end):
+        field, value = match.groups()
+        value = value.decode("utf-8")
+        for parser, counter in dispatch[field]:
+          parser(value, counter)
 
-  with open(filename, 'r', encoding="utf-8") as file:
-    for line in file:
-      globals()[PARSER_FUNC_PREFIX + mode](line, stats[mode])
 
+def parse_chunk(args):
+  "This function parses one byte range of file in worker process"
+  filename, modes, start, end, sketch = args
+  stats = {}
+  scan_file(filename, build_dispatch(modes, stats, sketch), start, end)
+  return stats
+
+
+def parse_file(filename, modes, stats, jobs=1, start=0, end=None,
+               sketch=None):
+  """
+  This function parses source file with data, all modes in a single pass
+
+  With more jobs the file is split into chunks parsed by worker processes,
+  partial statistics are merged in order of chunks.
+  """
+  if jobs > 1:
+    chunks = [(filename, modes, chunk_start, chunk_end, sketch)
+              for chunk_start, chunk_end
+              in find_chunks(filename, jobs, start, end)]
+    for mode in modes:
+      stats[mode] = new_counter(mode, sketch)
+    with multiprocessing.Pool(min(jobs, len(chunks))) as pool:
+      for partial in pool.map(parse_chunk, chunks):
+        for mode in modes:
+          stats[mode].update(partial[mode])
+    return
+
+  scan_file(filename, build_dispatch(modes, stats, sketch), start, end)
+
+
+def load_state(state_file):
+  "This function loads persisted statistics or returns None"
+  if not state_file or not path.isfile(state_file):
+    return None
+
+  try:
+    with open(state_file, 'r', encoding="utf-8") as file:
+      state = json.load(file)
+    state["stats"] = {mode: collections.Counter(dict(map(tuple, items)))
+                      for mode, items in state["stats"].items()}
+  except (OSError, ValueError, KeyError, TypeError):
+    eprint("State file %s is not valid, statistics will be recomputed"
+           % state_file)
+    return None
+
+  return state
+
+
+def save_state(state_file, modes, sketch, stats, offset, checksum):
+  "This function persists statistics with offset and checksum of parsed data"
+  state = {
+    "modes": modes,
+    "sketch": sketch,
+    "offset": offset,
+    "checksum": checksum,
+    #list of pairs keeps integer keys of century mode
+    "stats": {mode: list(stats[mode].items()) for mode in modes},
+  }
+
+  tmp_file = state_file + ".tmp"
+  with open(tmp_file, 'w', encoding="utf-8") as file:
+    json.dump(state, file, ensure_ascii=False)
+  os.replace(tmp_file, state_file)
+
+
+def parse_file_incremental(filename, modes, stats, jobs, state_file,
+                           sketch=None):
+  """
+  This function parses only data appended since the run which saved state
 
-def parse_line_composer(line, stats):
-  "This function parses line and alter composer statistic data"
-  composerLine = re.match(r'^Composer: (.*)', line)
-  if composerLine:
-    names = re.split(";", composerLine.group(1))
-    for name in names:
-      name = re.sub(r'[(].*[)]', '', name).strip()
-      if name:
-        stats[name] += 1
+  The persisted statistics are reused when the requested modes and sketch
+  are the same
+  and the checksum of the already parsed prefix of file still matches.
+  Data are parsed up to the last complete line, the state is then updated.
+  """
+  state = load_state(state_file)
+  checksum = hashlib.sha1()
+  start = 0
+  end = 0
 
+  if path.getsize(filename) > 0:
+    with open(filename, 'rb') as file:
+      with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        end = data.rfind(b"\n") + 1
+        with memoryview(data) as view:
+          if (state is not None and state.get("modes") == modes
+              and state.get("sketch") == (list(sketch) if sketch else None)
+              and 0 < state.get("offset", 0) <= end):
+            prefix = hashlib.sha1(view[:state["offset"]])
+            if prefix.hexdigest() == state.get("checksum"):
+              start = state["offset"]
+              checksum = prefix
+          checksum.update(view[start:end])
 
-def parse_line_century(line, stats):
-  "This function parses line and alter century statistic data"
-  def century_from_year(year):
-    return (year - 1) // 100 + 1
+  parse_file(filename, modes, stats, jobs, start, end, sketch)
+  if start:
+    for mode in modes:
+      stats[mode].update(state["stats"][mode])
 
-  centuryLine = re.match(r'^Composition Year:(.*)', line)
-  if centuryLine:
-    parsedYear = centuryLine.group(1).strip()
-    if parsedYear:
-      res = re.search(r".*(\d{4}).*", parsedYear)
+  save_state(state_file, modes, sketch, stats, end, checksum.hexdigest())
+
+
+def parse_line_composer(value, stats):
+  "This function parses composer field value and alter statistic data"
+  names = [RGX_PARENTHESES.sub('', name).strip() for name in value.split(";")]
+  stats.update(name for name in names if name)
+
+
+def century_from_year(year):
+  "This function converts year to century"
+  return (year - 1) // 100 + 1
+
+
+def parse_line_century(value, stats):
+  "This function parses composition year value and alter century statistic data"
+  parsedYear = value.strip()
+  if parsedYear:
+    res = RGX_YEAR.search(parsedYear)
+    if res:
+      year = res.group(1)
+    else:
+      res = RGX_CENTURY.search(parsedYear)
       if res:
-        year = res.group(1)
+        year = res.group(1) + "00"
       else:
-        res = re.search(r".*(\d{2}).*century", parsedYear)
-        if res:
-          year = res.group(1) + "00"
-        else:
-          year = None
+        year = None
+
+    if year:
+      stats[century_from_year(int(year))] += 1
 
-      if year:
-        stats[century_from_year(int(year))] += 1
 
+def parse_line_value(value, stats):
+  "This function counts stripped non-empty field value"
+  value = value.strip()
+  if value:
+    stats[value] += 1
 
-def print_stats(mode, stats):
-  "This function prints statistics"
-  globals()[PRINTER_FUNC_PREFIX + mode](stats[mode])
+
+parse_line_genre = parse_line_value
+parse_line_key = parse_line_value
+parse_line_edition = parse_line_value
+
+
+def print_stats(modes, stats):
+  "This function prints statistics, each mode has a header if more requested"
+  for idx, mode in enumerate(modes):
+    if len(modes) > 1:
+      if idx:
+        print()
+      print("[{}]".format(mode))
+    globals()[PRINTER_FUNC_PREFIX + mode](stats[mode])
 
 
 def print_stats_composer(stats):
   "This function prints composer mode statistics"
+  if isinstance(stats, SpaceSaving):
+    for key, value in stats.most_common():
+      print("{0}: {1}".format(key, value))
+    return
+
   ordered = collections.OrderedDict(sorted(stats.items()))
   for key, value in ordered.items():
     print("{0}: {1}".format(key, value))
 
 
+print_stats_genre = print_stats_composer
+print_stats_key = print_stats_composer
+print_stats_edition = print_stats_composer
+
+
 def print_stats_century(stats):
   "This function prints century mode statistics"
   def get_century_suffix(century):
@@ -108,6 +426,9 @@ def print_stats_century(stats):
 
 if __name__ == "__main__":
   stats = {}
-  file, mode = parse_args()
-  parse_file(file, mode, stats)
-  print_stats(mode, stats)
+  file, modes, jobs, state_file, sketch = parse_args()
+  if state_file:
+    parse_file_incremental(file, modes, stats, jobs, state_file, sketch)
+  else:
+    parse_file(file, modes, stats, jobs, sketch=sketch)
+  print_stats(modes, stats)
@@ -0,0 +1,71 @@
+#! python3
+
+"""
+This script compares throughput of Print.format() loop and write_prints
+"""
+import io
+import sys
+import time
+import argparse
+import contextlib
+from os import path
+from scorelib import load, write_prints, WRITERS
+
+
+def eprint(*args, **kwargs):
+  "This function prints message to error output"
+  print(*args, file=sys.stderr, **kwargs)
+
+
+def parse_args():
+  "This function parses command-line arguments and does basic checks"
+  parser = argparse.ArgumentParser()
+  parser.add_argument("filename", nargs="?", default="./scorelib.txt",
+                      help="source file")
+  parser.add_argument("-r", "--repeat", type=int, default=20,
+                      help="number of timed passes, the fastest is reported")
+
+  args = parser.parse_args()
+
+  if not path.isfile(args.filename):
+    eprint("Filename doesn't refer to a valid file")
+    exit(2)
+
+  return args.filename, args.repeat
+
+
+def best_rate(func, count, repeat):
+  "This function returns items per second of the fastest of repeated runs"
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return count / best
+
+
+def bench_format(prints, repeat):
+  "This function returns prints per second written by format() loop"
+  def run():
+    with contextlib.redirect_stdout(io.StringIO()):
+      for p in prints:
+        p.format()
+  return best_rate(run, len(prints), repeat)
+
+
+def bench_writer(prints, repeat, fmt):
+  "This function returns prints per second written by write_prints"
+  def run():
+    write_prints(prints, io.StringIO(newline=''), fmt)
+  return best_rate(run, len(prints), repeat)
+
+
+#script body
+FILENAME, REPEAT = parse_args()
+PRINTS = load(FILENAME)
+
+print("format(): {:.0f} prints/s".format(bench_format(PRINTS, REPEAT)))
+for FMT in sorted(WRITERS):
+  print("write_prints {}: {:.0f} prints/s".format(
+    FMT, bench_writer(PRINTS, REPEAT, FMT)))
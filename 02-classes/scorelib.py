@@ -1,5 +1,32 @@
 #!/usr/bin/python3
 import re
+import sys
+import csv
+import json
+
+
+def normalize_name(name):
+  """
+  Returns name with collapsed whitespace used as a key of PersonIndex.
+
+  Parameters:
+    name (str): The name of the person or None.
+  """
+  if name is None:
+    return None
+  return " ".join(name.split())
+
+
+def intern_str(value):
+  """
+  Returns interned string so equal values share one object.
+
+  Parameters:
+    value (str): The string value or None.
+  """
+  if isinstance(value, str):
+    return sys.intern(value)
+  return value
 
 
 class Print:
@@ -11,7 +38,9 @@ class Print:
     edition (Edition): Instance of Edition class.
     partiture (boolean): Partiture flag.
   """
-  def __init__(self, record):
+  __slots__ = ('print_id', 'edition', 'partiture')
+
+  def __init__(self, record, persons=None):
     """
     The constructor for Print class.
 
@@ -19,7 +48,10 @@ class Print:
 
     Parameters:
 	    record (dict): Parsed record of print element.
+	    persons (PersonIndex): Index of shared persons or None.
     """
+    person = Person if persons is None else persons.get
+
     try:
       self.print_id = int(record.get('print_id'))
     except TypeError:
@@ -29,7 +61,7 @@ class Print:
 
     authors = []
     for c in record.get('composers', []):
-      authors.append(Person(c.get('name'), c.get('birth'), c.get('death')))
+      authors.append(person(c.get('name'), c.get('birth'), c.get('death')))
 
     voices = []
     for v in record.get('voices', []):
@@ -37,7 +69,7 @@ class Print:
 
     editors = []
     for e in record.get('editors', []):
-      editors.append(Person(e.get('name'), e.get('birth'), e.get('death')))
+      editors.append(person(e.get('name'), e.get('birth'), e.get('death')))
 
     composition = Composition(name=record.get('title'),
                               incipit=record.get('incipit'),
@@ -108,6 +140,8 @@ class Person:
     born (int): Year of birth or None.
     died (int): Year of death or None.
   """
+  __slots__ = ('name', 'born', 'died')
+
   def __init__(self, name, born, died):
     """
     The constructor for Person class.
@@ -117,7 +151,7 @@ class Person:
 	    born (int): Year of birth or None.
 	    died (int): Year of death or None.
     """
-    self.name = name
+    self.name = intern_str(name)
     try:
       self.born = int(born)
     except:
@@ -129,6 +163,62 @@ class Person:
       self.died = None
 
 
+class PersonIndex:
+  """
+  This is a class representing identity map of Person instances.
+
+  Persons are keyed by normalized name, so every occurrence of the same name
+  shares one Person instance. Years of birth and death are merged the same
+  way Person.persist merges them in database.
+
+  Attributes:
+    persons (dict): Person instances by normalized name.
+  """
+  def __init__(self):
+    """
+    The constructor for PersonIndex class.
+    """
+    self.persons = {}
+
+
+  def get(self, name, born, died):
+    """
+    Returns shared Person with given name, years update the known ones.
+
+    Parameters:
+      name (str): Name of the person.
+      born (int): Year of birth or None.
+      died (int): Year of death or None.
+    """
+    key = normalize_name(name)
+    person = self.persons.get(key)
+    if person is None:
+      person = Person(name, born, died)
+      self.persons[key] = person
+      return person
+
+    update = Person(name, born, died)
+    if update.born is not None:
+      person.born = update.born
+    if update.died is not None:
+      person.died = update.died
+    return person
+
+
+  def find(self, name):
+    """
+    Returns shared Person with given name or None.
+
+    Parameters:
+      name (str): Name of the person.
+    """
+    return self.persons.get(normalize_name(name))
+
+
+  def __len__(self):
+    return len(self.persons)
+
+
 class Voice:
   """
   This is a class representing Voice.
@@ -137,6 +227,8 @@ class Voice:
     name (str): Name of the voice or None.
     range (str): Range of the voice or None.
   """
+  __slots__ = ('name', 'range')
+
   def __init__(self, name, range):
     """
     The constructor for Voice class.
@@ -145,8 +237,8 @@ class Voice:
 	    name (str): Name of the voice or None.
 	    range (str): Range of the voice or None.
     """
-    self.name = name
-    self.range = range
+    self.name = intern_str(name)
+    self.range = intern_str(range)
 
 
 class Composition:
@@ -162,6 +254,8 @@ class Composition:
     voices (list of Voice): The voices in this composition.
     authors (list of Person): The authors of this composition.
   """
+  __slots__ = ('name', 'incipit', 'key', 'genre', 'year', 'voices', 'authors')
+
   def __init__(self, name, incipit, key, genre, year, voices, authors):
     """
     The constructor for Composition class.
@@ -177,8 +271,8 @@ class Composition:
     """
     self.name = name
     self.incipit = incipit
-    self.key = key
-    self.genre = genre
+    self.key = intern_str(key)
+    self.genre = intern_str(genre)
     try:
       self.year = int(year)
     except:
@@ -196,6 +290,7 @@ class Edition:
     authors (list of Person): The authors of the edition.
     name (str): Name of the edition or None.
   """
+  __slots__ = ('composition', 'authors', 'name')
 
   def __init__(self, composition, authors, name):
     """
@@ -208,139 +303,169 @@ class Edition:
     """
     self.composition = composition
     self.authors = authors
-    self.name = name
-
-
-def parse_record_line(line, record):
-  """
-  Parses record line to dictionary.
-
-  Parameters:
-    line (str): The record line from source file.
-    record (dict): The dictionary with parsed values.
-  """
-  def parse_partiture(data):
-    if re.search(r'yes|true|True|Yes', data):
-      return True
-    return False
-
-  def parse_composers(line):
-    "This function parses all composers from line"
-    composers_list = []
-    composers = re.split(";", line)
-    for composer in composers:
-      item = {}
-      item["name"] = re.sub(r'[(].*[)]', '', composer).strip()
-
-      dates = re.search(r'[(](\d{4})?-?-?(\d{4})?[)]', composer)
+    self.name = intern_str(name)
+
+
+RGX_PARTITURE = re.compile(r'yes|true|True|Yes')
+RGX_PARENTHESES = re.compile(r'[(].*[)]')
+RGX_DATES_RANGE = re.compile(r'[(](\d{4})?-?-?(\d{4})?[)]')
+RGX_DATES_SIGN = re.compile(r'[(]([+*])(\d{4})[)]')
+RGX_DATES_DEATH = re.compile(r'[(][^-]*-?-?(\d{4})[)]')
+RGX_DATES_BIRTH = re.compile(r'[(](\d{4})-?-?.*[)]')
+RGX_VOICE = re.compile(r'(?P<range>\w+--\w+)[,;]?(?P<name>.*)')
+RGX_EDITORS = re.compile(r'([\w.]+,?\s{1}[\w.]+)')
+RGX_WORD = re.compile(r'(\w+)')
+RGX_DIGITS = re.compile(r'[^\d]*(\d+)')
+RGX_YEAR = re.compile(r'.*(\d{4})')
+
+
+def parse_partiture(data):
+  "This function parses partiture flag"
+  if RGX_PARTITURE.search(data):
+    return True
+  return False
+
+
+def parse_composers(line):
+  "This function parses all composers from line"
+  composers_list = []
+  for composer in line.split(";"):
+    item = {}
+    item["name"] = RGX_PARENTHESES.sub('', composer).strip()
+
+    dates = RGX_DATES_RANGE.search(composer)
+    if dates:
+      item["birth"] = dates.group(1)
+      item["death"] = dates.group(2)
+    else:
+      dates = RGX_DATES_SIGN.search(composer)
       if dates:
-        item["birth"] = dates.group(1)
-        item["death"] = dates.group(2)
+        if dates.group(1) == '*':
+          item["birth"] = dates.group(2)
+        else:
+          item["death"] = dates.group(2)
       else:
-        dates = re.search(r'[(]([+*])(\d{4})[)]', composer)
+        dates = RGX_DATES_DEATH.search(composer)
         if dates:
-          if dates.group(1) == '*':
-            item["birth"] = dates.group(2)
-          else:
-            item["death"] = dates.group(2)
+          item["death"] = dates.group(1)
         else:
-          dates = re.search(r'[(][^-]*-?-?(\d{4})[)]', composer)
+          dates = RGX_DATES_BIRTH.search(composer)
           if dates:
-            item["death"] = dates.group(1)
-          else:
-            dates = re.search(r'[(](\d{4})-?-?.*[)]', composer)
-            if dates:
-              item["birth"] = dates.group(1)
-
-      composers_list.append(item)
-    return composers_list
-
-  def parse_voices(line, record):
-    "This function parses all voices from line"
-    voice = {}
-    res = re.search(r'(?P<range>\w+--\w+)[,;]?(?P<name>.*)', line)
-    if res:
-      if res.group("name"):
-        voice["name"] = res.group("name").strip()
-      voice["range"] = res.group("range").strip()
-    else:
-      voice["name"] = line.strip()
+            item["birth"] = dates.group(1)
 
-    if record.get("voices"):
-      record["voices"].append(voice)
-    else:
-      record["voices"] = [voice]
-
-  def parse_editors(line):
-    "This function parses all editors from line"
-    editors_list = []
-    editors = re.findall(r'([\w.]+,?\s{1}[\w.]+)', line)
-    if not editors:
-      editor = re.search(r'(\w+)', line)
-      if editor:
-        editors_list.append({"name": editor.group(1)})
-    else:
-      for editor in editors:
-        editors_list.append({"name": editor})
+    composers_list.append(item)
+  return composers_list
 
-    return editors_list
 
+def parse_voices(line, record):
+  "This function parses all voices from line"
+  voice = {}
+  res = RGX_VOICE.search(line)
+  if res:
+    if res.group("name"):
+      voice["name"] = res.group("name").strip()
+    voice["range"] = res.group("range").strip()
+  else:
+    voice["name"] = line.strip()
 
-  pritnNr = re.match(r'^Print Number:[^\d]*(\d+).*', line)
-  if pritnNr:
-    record["print_id"] = pritnNr.group(1)
-    return
+  if record.get("voices"):
+    record["voices"].append(voice)
+  else:
+    record["voices"] = [voice]
 
-  partiture = re.match(r'^Partiture:(.*)', line)
-  if partiture:
-    record["partiture"] = parse_partiture(partiture.group(1))
-    return
 
-  title = re.match(r'^Title:(.*)', line)
-  if title:
-    record["title"] = title.group(1).strip()
-    return
+def parse_editors(line):
+  "This function parses all editors from line"
+  editors_list = []
+  editors = RGX_EDITORS.findall(line)
+  if not editors:
+    editor = RGX_WORD.search(line)
+    if editor:
+      editors_list.append({"name": editor.group(1)})
+  else:
+    for editor in editors:
+      editors_list.append({"name": editor})
 
-  incipit = re.match(r'^Incipit:(.*)', line)
-  if incipit:
-    record["incipit"] = incipit.group(1).strip()
-    return
+  return editors_list
 
-  key = re.match(r'^Key:(.*)', line)
-  if key:
-    record["key"] = key.group(1).strip()
-    return
 
-  genre = re.match(r'^Genre:(.*)', line)
-  if genre:
-    record["genre"] = genre.group(1).strip()
-    return
+def parse_field_print_number(value, record):
+  "This function parses print number field value"
+  print_nr = RGX_DIGITS.match(value)
+  if print_nr:
+    record["print_id"] = print_nr.group(1)
 
-  compositionYear = re.match(r'^Composition Year:.*(\d{4}).*', line)
-  if compositionYear:
-    record["composition_year"] = compositionYear.group(1)
-    return
 
-  edition = re.match(r'^Edition:(.*)', line)
-  if edition:
-    record["edition_name"] = edition.group(1).strip()
-    return
+def parse_field_composition_year(value, record):
+  "This function parses composition year field value"
+  year = RGX_YEAR.match(value)
+  if year:
+    record["composition_year"] = year.group(1)
 
-  editors = re.match(r'^Editor:(.*)', line)
-  if editors:
-    record["editors"] = parse_editors(editors.group(1).strip())
-    return
 
-  composers = re.match(r'^Composer:(.*)', line)
-  if composers:
-    record["composers"] = parse_composers(composers.group(1).strip())
-    return
+def parse_field_partiture(value, record):
+  "This function parses partiture field value"
+  record["partiture"] = parse_partiture(value)
+
+
+def parse_field_editors(value, record):
+  "This function parses editor field value"
+  record["editors"] = parse_editors(value.strip())
+
+
+def parse_field_composers(value, record):
+  "This function parses composer field value"
+  record["composers"] = parse_composers(value.strip())
+
+
+def field_parser_strip(key):
+  "This function returns parser storing stripped field value under given key"
+  def parse_field(value, record):
+    record[key] = value.strip()
+  return parse_field
+
+
+def parse_field_voice(value, record):
+  "This function parses voice field value"
+  parse_voices(value.strip(), record)
+
+
+#parsers of record fields keyed by field name (text before the first colon)
+FIELD_PARSERS = {
+  "Print Number": parse_field_print_number,
+  "Partiture": parse_field_partiture,
+  "Title": field_parser_strip("title"),
+  "Incipit": field_parser_strip("incipit"),
+  "Key": field_parser_strip("key"),
+  "Genre": field_parser_strip("genre"),
+  "Composition Year": parse_field_composition_year,
+  "Edition": field_parser_strip("edition_name"),
+  "Editor": parse_field_editors,
+  "Composer": parse_field_composers,
+}
+
+
+def parse_record_line(line, record):
+  """
+  Parses record line to dictionary.
 
-  voices = re.match(r'^Voice \d+:(.*)', line)
-  if voices:
-    parse_voices(voices.group(1).strip(), record)
+  The line is split on the first colon only once and the value is passed
+  to the parser of its field found in FIELD_PARSERS.
+
+  Parameters:
+    line (str): The record line from source file.
+    record (dict): The dictionary with parsed values.
+  """
+  field, sep, value = line.partition(":")
+  if not sep:
     return
 
+  parser = FIELD_PARSERS.get(field)
+  if parser is not None:
+    parser(value, record)
+  elif field.startswith("Voice ") and field[6:].isdigit():
+    parse_field_voice(value, record)
+
 
 def read_in_records(filename):
   """
@@ -366,19 +491,189 @@ def read_in_records(filename):
   yield record
 
 
-def load(filename):
+def iter_prints(filename, persons=None):
   """
-  Reads and parses the text file and returns a list of Print instances.
+  Lazy function (generator) to read Print instances record by record.
+
+  Each Print is constructed as soon as its record is parsed.
 
   Parameters:
     filename (str): The filename of source file.
+    persons (PersonIndex): Index of shared persons or None to keep persons
+      of each record separate, as they are written in the stanza.
 
   Returns:
-    list of Print instances sorted by print_id
+    Print instance
   """
-  records = []
   for record in read_in_records(filename):
     if record:
-      records.append(Print(record))
+      yield Print(record, persons)
+
+
+def load(filename, persons=None):
+  """
+  Reads and parses the text file and returns a list of Print instances.
+
+  Parameters:
+    filename (str): The filename of source file.
+    persons (PersonIndex): Index of shared persons or None.
 
-  return records
+  Returns:
+    list of Print instances sorted by print_id
+  """
+  return list(iter_prints(filename, persons))
+
+
+TEXT_FORMAT = 'text'
+JSONL_FORMAT = 'jsonl'
+CSV_FORMAT = 'csv'
+TEXT_STANZA = ("Print Number: {}\n"
+               "Composer: {}\n"
+               "Title: {}\n"
+               "Genre: {}\n"
+               "Key: {}\n"
+               "Composition Year: {}\n"
+               "Edition: {}\n"
+               "Editor: {}\n"
+               "{}\n"
+               "Partiture: {}\n"
+               "Incipit: {}\n"
+               "\n")
+CSV_HEADER = ("Print Number", "Composer", "Title", "Genre", "Key",
+              "Composition Year", "Edition", "Editor", "Voices", "Partiture",
+              "Incipit")
+
+
+def format_composer(author):
+  """
+  Formats composer the same way as Print.format does.
+
+  Parameters:
+    author (Person): The composer.
+  """
+  if author.born or author.died:
+    return "{} ({}--{})".format(author.name, author.born or '',
+                                author.died or '')
+  return author.name
+
+
+def format_voice(voice):
+  """
+  Formats voice value the same way as Print.format does.
+
+  Parameters:
+    voice (Voice): The voice.
+  """
+  if voice.range and voice.name:
+    return voice.range + ", " + voice.name
+  return voice.range or voice.name or ''
+
+
+def write_prints_text(prints, stream):
+  """
+  Writes prints as text stanzas equal to the output of Print.format.
+
+  Parameters:
+    prints (iterable of Print): The prints to write.
+    stream (file): The buffered text output stream.
+  """
+  write = stream.write
+  stanza = TEXT_STANZA.format
+  for p in prints:
+    edition = p.edition
+    comp = edition.composition
+    voices = comp.voices
+    write(stanza(
+      p.print_id or '',
+      "; ".join(map(format_composer, comp.authors)),
+      comp.name or '',
+      comp.genre or '',
+      comp.key or '',
+      comp.year or '',
+      edition.name or '',
+      ", ".join([editor.name for editor in edition.authors]),
+      "\n".join(["Voice {}: {}".format(i, format_voice(v))
+                 for i, v in enumerate(voices, 1)]) if voices else "Voice 1: ",
+      p.partiture,
+      comp.incipit or ''))
+
+
+def write_prints_jsonl(prints, stream):
+  """
+  Writes prints as JSON Lines, one JSON object per print.
+
+  Parameters:
+    prints (iterable of Print): The prints to write.
+    stream (file): The buffered text output stream.
+  """
+  write = stream.write
+  #records are trees of fresh dicts and lists, no reference cycle to check
+  dumps = json.JSONEncoder(ensure_ascii=False, check_circular=False).encode
+  for p in prints:
+    edition = p.edition
+    comp = edition.composition
+    write(dumps({
+      "Print Number": p.print_id,
+      "Composer": [{"name": a.name, "born": a.born, "died": a.died}
+                   for a in comp.authors],
+      "Title": comp.name,
+      "Genre": comp.genre,
+      "Key": comp.key,
+      "Composition Year": comp.year,
+      "Edition": edition.name,
+      "Editor": [{"name": e.name, "born": e.born, "died": e.died}
+                 for e in edition.authors],
+      "Voices": [{"name": v.name, "range": v.range} for v in comp.voices],
+      "Partiture": p.partiture,
+      "Incipit": comp.incipit,
+    }))
+    write("\n")
+
+
+def write_prints_csv(prints, stream):
+  """
+  Writes prints as CSV with header, list values are joined like in stanza.
+
+  Parameters:
+    prints (iterable of Print): The prints to write.
+    stream (file): The buffered text output stream opened with newline=''.
+  """
+  writer = csv.writer(stream)
+  writer.writerow(CSV_HEADER)
+  writerow = writer.writerow
+  for p in prints:
+    edition = p.edition
+    comp = edition.composition
+    writerow((p.print_id,
+              "; ".join(map(format_composer, comp.authors)),
+              comp.name,
+              comp.genre,
+              comp.key,
+              comp.year,
+              edition.name,
+              ", ".join([editor.name for editor in edition.authors]),
+              "; ".join(map(format_voice, comp.voices)),
+              p.partiture,
+              comp.incipit))
+
+
+WRITERS = {
+  TEXT_FORMAT: write_prints_text,
+  JSONL_FORMAT: write_prints_jsonl,
+  CSV_FORMAT: write_prints_csv,
+}
+
+
+def write_prints(prints, stream, fmt=TEXT_FORMAT):
+  """
+  Serializes prints directly into the output stream in the given format.
+
+  Only the text writer is faster than calling format() on each print, CSV
+  and JSON Lines writers provide the other formats and are not faster.
+
+  Parameters:
+    prints (iterable of Print): The prints to write, e.g. from iter_prints.
+    stream (file): The buffered text output stream.
+    fmt (str): One of TEXT_FORMAT, JSONL_FORMAT or CSV_FORMAT.
+  """
+  WRITERS[fmt](prints, stream)
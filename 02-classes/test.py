@@ -2,7 +2,7 @@
 import sys
 import argparse
 from os import path
-from scorelib import load
+from scorelib import iter_prints, write_prints, WRITERS, TEXT_FORMAT
 
 def eprint(*args, **kwargs):
   "This function prints message to error output"
@@ -13,6 +13,9 @@ def parse_args():
   "This function parses command-line arguments and does basic checks"
   parser = argparse.ArgumentParser()
   parser.add_argument("filename", help="source file")
+  parser.add_argument("-f", "--format", choices=sorted(WRITERS),
+                      help="write all prints at once in the given format "
+                           "instead of calling format() on each print")
 
   args = parser.parse_args()
 
@@ -20,11 +23,15 @@ def parse_args():
     eprint("Filename doesn't refer to a valid file")
     exit(2)
 
-  return args.filename
+  return args.filename, args.format
 
 
 #script body
-filename = parse_args()
-print_list = load(filename)
-for p in print_list:
-  p.format()
+filename, fmt = parse_args()
+if fmt is None:
+  for p in iter_prints(filename):
+    p.format()
+else:
+  if fmt != TEXT_FORMAT:
+    sys.stdout.reconfigure(newline='')
+  write_prints(iter_prints(filename), sys.stdout, fmt)
@@ -0,0 +1,56 @@
+#! python3
+
+"""
+This script measures memory used by Print objects loaded from text file
+"""
+import sys
+import gc
+import argparse
+import tracemalloc
+from os import path
+import scorelib
+
+
+def eprint(*args, **kwargs):
+  "This function prints message to error output"
+  print(*args, file=sys.stderr, **kwargs)
+
+
+def parse_args():
+  "This function parses command-line arguments and does basic checks"
+  parser = argparse.ArgumentParser()
+  parser.add_argument("filename", nargs="?", default="./scorelib.txt",
+                      help="source file")
+
+  args = parser.parse_args()
+
+  if not path.isfile(args.filename):
+    eprint("Filename doesn't refer to a valid file")
+    exit(2)
+
+  return args.filename
+
+
+def bench_load(filename):
+  """
+  This function loads all prints while tracing memory allocations
+
+  Returns: number of loaded prints, bytes retained by them, peak bytes
+  """
+  gc.collect()
+  tracemalloc.start()
+  prints = scorelib.load(filename)
+  gc.collect()
+  retained, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+
+  return len(prints), retained, peak
+
+
+#script body
+FILENAME = parse_args()
+
+COUNT, RETAINED, PEAK = bench_load(FILENAME)
+print("loaded prints: {}".format(COUNT))
+print("retained: {} B, {:.0f} B per print".format(RETAINED, RETAINED / COUNT))
+print("peak: {} B".format(PEAK))
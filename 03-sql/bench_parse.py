@@ -0,0 +1,59 @@
+#! python3
+
+"""
+This script measures parsing throughput of scorelib record lines
+"""
+import sys
+import time
+import argparse
+from os import path
+import scorelib
+
+
+def eprint(*args, **kwargs):
+  "This function prints message to error output"
+  print(*args, file=sys.stderr, **kwargs)
+
+
+def parse_args():
+  "This function parses command-line arguments and does basic checks"
+  parser = argparse.ArgumentParser()
+  parser.add_argument("filename", nargs="?", default="./scorelib.txt",
+                      help="source file")
+  parser.add_argument("-r", "--repeat", type=int, default=20,
+                      help="number of passes over the file")
+
+  args = parser.parse_args()
+
+  if not path.isfile(args.filename):
+    eprint("Filename doesn't refer to a valid file")
+    exit(2)
+
+  return args.filename, args.repeat
+
+
+def bench_lines(lines, repeat):
+  """
+  This function parses all lines repeatedly
+
+  Returns: number of parsed lines per second
+  """
+  start = time.perf_counter()
+  for _ in range(repeat):
+    record = {}
+    for line in lines:
+      if line == "\n":
+        record = {}
+      scorelib.parse_record_line(line, record)
+  elapsed = time.perf_counter() - start
+
+  return len(lines) * repeat / elapsed
+
+
+#script body
+FILENAME, REPEAT = parse_args()
+
+with open(FILENAME, 'r', encoding="utf-8") as FILE:
+  LINES = FILE.readlines()
+
+print("parse_record_line: {:.0f} lines/s".format(bench_lines(LINES, REPEAT)))
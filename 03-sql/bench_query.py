@@ -0,0 +1,120 @@
+#! python3
+
+"""
+This script compares query latency on database with and without indexes
+"""
+import os
+import sys
+import time
+import argparse
+import sqlite3
+
+DB_SCHEMA_SCRIPT = "./scorelib.sql"
+
+#queries of importer deduplication and of 04-json scripts, each takes one id
+#or name of the sample
+QUERIES = (
+  ("person by name", "name",
+   "SELECT * FROM person WHERE name = ?"),
+  ("edition by name", "edition",
+   "SELECT * FROM edition WHERE name = ?"),
+  ("score authors", "score",
+   "SELECT p.name FROM score_author sa join person p on (sa.composer = p.id) "
+   "WHERE sa.score = ?"),
+  ("score voices", "score",
+   "SELECT * FROM voice WHERE score = ? ORDER BY number"),
+  ("edition editors", "edition_id",
+   "SELECT p.name FROM edition_author sa join person p on (sa.editor = p.id) "
+   "WHERE sa.edition = ?"),
+  ("print authors", "print",
+   "select p.* from print pr join edition e on pr.edition = e.id "
+   "join score s on e.score = s.id join score_author sa on sa.score = s.id "
+   "join person p on sa.composer = p.id where pr.id = ?"),
+  ("prints by composer", "person",
+   "select pr.id from print pr join edition e on pr.edition = e.id "
+   "join score s on e.score = s.id join score_author sa on sa.score = s.id "
+   "where sa.composer = ?"),
+)
+
+
+def eprint(*args, **kwargs):
+  "This function prints message to error output"
+  print(*args, file=sys.stderr, **kwargs)
+
+
+def parse_args():
+  "This function parses command-line arguments and does basic checks"
+  parser = argparse.ArgumentParser()
+  parser.add_argument("database", help="SQLite database file")
+  parser.add_argument("-n", "--samples", type=int, default=200,
+                      help="number of sampled ids and names per query")
+
+  args = parser.parse_args()
+
+  if not os.path.isfile(args.database):
+    eprint("Database file doesn't exist")
+    exit(2)
+
+  return args.database, args.samples
+
+
+def copy_database(database, indexed):
+  "This function copies database to memory, with or without indexes"
+  source = sqlite3.connect(database)
+  con = sqlite3.connect(":memory:")
+  source.backup(con)
+  source.close()
+
+  if indexed:
+    with open(DB_SCHEMA_SCRIPT, "r") as script_file:
+      con.executescript(script_file.read())
+  else:
+    indexes = con.execute("SELECT name FROM sqlite_master WHERE type = 'index' "
+                          "and sql is not null").fetchall()
+    for (name,) in indexes:
+      con.execute("DROP INDEX {}".format(name))
+  con.execute("ANALYZE")
+  return con
+
+
+def get_samples(con, count):
+  "This function returns sampled parameters of queries by their kind"
+  sql = {
+    "name": "SELECT name FROM person",
+    "edition": "SELECT name FROM edition",
+    "edition_id": "SELECT id FROM edition",
+    "score": "SELECT id FROM score",
+    "print": "SELECT id FROM print",
+    "person": "SELECT composer FROM score_author",
+  }
+  samples = {}
+  for kind, query in sql.items():
+    rows = con.execute(query).fetchall()
+    step = max(len(rows) // count, 1)
+    samples[kind] = rows[::step][:count]
+  return samples
+
+
+def bench(con, samples):
+  "This function returns mean latency in microseconds of each query"
+  result = []
+  for title, kind, sql in QUERIES:
+    start = time.perf_counter()
+    for params in samples[kind]:
+      con.execute(sql, params).fetchall()
+    elapsed = time.perf_counter() - start
+    result.append((title, elapsed / max(len(samples[kind]), 1) * 1e6))
+  return result
+
+
+#script body
+DB, SAMPLES = parse_args()
+
+PLAIN = copy_database(DB, False)
+INDEXED = copy_database(DB, True)
+PARAMS = get_samples(PLAIN, SAMPLES)
+
+print("{:<20} {:>14} {:>14}".format("query", "no index [us]", "indexed [us]"))
+for (TITLE, PLAIN_US), (_, INDEXED_US) in zip(bench(PLAIN, PARAMS),
+                                             bench(INDEXED, PARAMS)):
+  print("{:<20} {:>14.1f} {:>14.1f}".format(TITLE, PLAIN_US, INDEXED_US))
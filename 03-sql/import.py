@@ -5,10 +5,17 @@ This module creates database schema and persists parsed objects
 """
 import os
 import sys
+import queue
 import argparse
 import sqlite3
+import collections
+import threading
 import scorelib
 
+#prints committed together by pipeline writer and batches held in its queue
+PIPELINE_BATCH = 500
+PIPELINE_DEPTH = 8
+
 def eprint(*args, **kwargs):
   "This function prints message to error output"
   print(*args, file=sys.stderr, **kwargs)
@@ -19,6 +26,19 @@ def parse_args():
   parser = argparse.ArgumentParser()
   parser.add_argument("filename", help="source file")
   parser.add_argument("database", help="SQLite database file")
+  parser.add_argument("-j", "--jobs", type=int, default=1,
+                      help="number of worker processes parsing source file")
+  parser.add_argument("-b", "--bulk", action="store_true",
+                      help="resolve all entities in memory and write them "
+                           "with executemany")
+  parser.add_argument("--fast", action="store_true",
+                      help="use WAL journal and no fsync while importing")
+  parser.add_argument("-u", "--update", action="store_true",
+                      help="keep existing database and upsert only new "
+                           "or changed prints")
+  parser.add_argument("-p", "--pipeline", action="store_true",
+                      help="write prints in a separate thread while the "
+                           "source file is being parsed")
 
   args = parser.parse_args()
 
@@ -26,14 +46,27 @@ def parse_args():
     eprint("Filename doesn't refer to a valid file")
     exit(2)
 
-  if os.path.isfile(args.database):
+  if args.jobs < 1:
+    eprint("Number of jobs must be positive")
+    exit(2)
+
+  if args.update and args.bulk:
+    eprint("Bulk mode can't update existing database")
+    exit(2)
+
+  if args.pipeline and (args.bulk or args.update):
+    eprint("Pipeline can't be combined with bulk or update mode")
+    exit(2)
+
+  if os.path.isfile(args.database) and not args.update:
     eprint("Database file already exists, will be overwritten")
     try:
       os.remove(args.database)
     except OSError:
       pass
 
-  return args.filename, args.database
+  return (args.filename, args.database, args.jobs, args.bulk, args.fast,
+          args.update, args.pipeline)
 
 
 def create_db_schema(database, script):
@@ -50,28 +83,334 @@ def create_db_schema(database, script):
     con.commit()
 
 
-def persist_objects(database, lst):
-  "This function persists objects in the given list"
+def connect(database, fast=False):
+  """
+  This function opens database connection for import
 
+  In fast mode the journal is switched to WAL and fsync is turned off.
+  """
   con = sqlite3.connect(database)
   con.row_factory = sqlite3.Row
+  if fast:
+    con.execute("PRAGMA journal_mode = WAL")
+    con.execute("PRAGMA synchronous = OFF")
+  return con
+
+
+def disconnect(con, fast=False):
+  "This function commits and closes connection, fast mode pragmas are reset"
+  con.commit()
+  if fast:
+    con.execute("PRAGMA journal_mode = DELETE")
+  con.close()
+
+
+SQL_HASH = "INSERT OR REPLACE INTO print_hash (print, hash) VALUES (?,?)"
+
+
+def persist_objects(database, lst, fast=False):
+  """
+  This function persists objects from the given iterable in one transaction
+
+  Persisted entities are cached, so database is not queried for equal ones.
+  """
+  con = connect(database, fast)
   cur = con.cursor()
+  cache = scorelib.PersistCache()
+  hashes = {}
 
   for obj in lst:
-    obj.persist(cur)
-    con.commit()
+    #unnumbered prints get ids of their rows, duplicate numbers keep the first
+    hashes.setdefault(obj.persist(cur, cache), obj.content_hash())
 
-  con.close()
+  cur.executemany(SQL_HASH, hashes.items())
+  disconnect(con, fast)
+
+
+def persist_objects_pipeline(database, lst, fast=False, batch=PIPELINE_BATCH,
+                             depth=PIPELINE_DEPTH):
+  """
+  This function persists objects in a writer thread fed by bounded queue
+
+  Objects are produced (e.g. by parallel parsing in iter_prints) while the
+  writer persists and commits previous batches, so parsing and database I/O
+  overlap. Shared persons may still change while a batch waits in the
+  queue, so producer passes frozen copies of prints with their content
+  hashes and the writer stores the same years as sequential import.
+  """
+  batches = queue.Queue(depth)
+  errors = []
+
+  def writer():
+    con = None
+    done = False
+    try:
+      con = connect(database, fast)
+      cur = con.cursor()
+      cache = scorelib.PersistCache()
+      hashes = {}
+      while True:
+        items = batches.get()
+        if items is None:
+          done = True
+          break
+        for obj, digest in items:
+          hashes.setdefault(obj.persist(cur, cache), digest)
+        con.commit()
+      cur.executemany(SQL_HASH, hashes.items())
+    except Exception as err:
+      #any error is re-raised by producer, the failed batch is not committed
+      errors.append(err)
+      if con is not None:
+        con.rollback()
+    finally:
+      #keep draining the queue, so producer is never blocked
+      while not done:
+        done = batches.get() is None
+      if con is not None:
+        disconnect(con, fast)
+
+  thread = threading.Thread(target=writer)
+  thread.start()
+  try:
+    items = []
+    for obj in lst:
+      items.append((obj.frozen(), obj.content_hash()))
+      if len(items) >= batch:
+        batches.put(items)
+        items = []
+    if items:
+      batches.put(items)
+  finally:
+    batches.put(None)
+    thread.join()
+
+  if errors:
+    raise errors[0]
+
+
+def delete_orphans(cursor):
+  "This function deletes entities which no print refers to any more"
+  cursor.execute("DELETE FROM edition_author WHERE edition NOT IN "
+                 "(SELECT edition FROM print WHERE edition IS NOT NULL)")
+  cursor.execute("DELETE FROM edition WHERE id NOT IN "
+                 "(SELECT edition FROM print WHERE edition IS NOT NULL)")
+  cursor.execute("DELETE FROM score_author WHERE score NOT IN "
+                 "(SELECT score FROM edition)")
+  cursor.execute("DELETE FROM voice WHERE score NOT IN "
+                 "(SELECT score FROM edition)")
+  cursor.execute("DELETE FROM score WHERE id NOT IN (SELECT score FROM edition)")
+  cursor.execute("DELETE FROM person WHERE id NOT IN "
+                 "(SELECT composer FROM score_author) AND id NOT IN "
+                 "(SELECT editor FROM edition_author)")
+
+
+def persist_objects_incremental(database, lst, fast=False):
+  """
+  This function upserts only new or changed objects into existing database
+
+  A print is changed when content hash of its stanza differs from the stored
+  one. Changed prints are deleted and persisted again, entities left without
+  prints are deleted at the end. Prints missing in the source are kept.
+  Prints without number are matched by content hash only, so a changed one
+  is counted as new.
+
+  Returns: numbers of new, changed and unchanged prints
+  """
+  con = connect(database, fast)
+  cur = con.cursor()
+  cache = scorelib.PersistCache()
+  cache.fill(cur)
+  cur.execute("SELECT print, hash FROM print_hash")
+  hashes = {row["print"]: row["hash"] for row in cur.fetchall()}
+  #hash of stanza includes print number, so hashes of unnumbered prints
+  #differ from numbered ones, each stored print is matched once
+  unnumbered = collections.Counter(hashes.values())
+
+  new, changed, unchanged = 0, 0, 0
+  seen = set()
+  for obj in lst:
+    #the first print of duplicate numbers wins, as in full import
+    if obj.print_id in seen:
+      continue
+    if obj.print_id is not None:
+      seen.add(obj.print_id)
+
+    digest = obj.content_hash()
+    if obj.print_id is None:
+      if unnumbered[digest] > 0:
+        unnumbered[digest] -= 1
+        unchanged += 1
+        continue
+      new += 1
+    elif obj.print_id in cache.prints:
+      if hashes.get(obj.print_id) == digest:
+        unchanged += 1
+        continue
+      cur.execute("DELETE FROM print WHERE id = ?", (obj.print_id,))
+      cache.prints.discard(obj.print_id)
+      changed += 1
+    else:
+      new += 1
+
+    print_id = obj.persist(cur, cache)
+    cur.execute(SQL_HASH, (print_id, digest))
+
+  if changed:
+    delete_orphans(cur)
+  disconnect(con, fast)
+  return new, changed, unchanged
+
+
+class BulkImport:
+  """
+  This is a class resolving entities of prints in memory for bulk insert.
+
+  Entities are resolved in PersistCache by find methods of scorelib classes,
+  so the equality rules are the same as in persist methods. Ids are assigned
+  in the same order as database would assign them and all rows are then
+  written with executemany.
+
+  Attributes:
+    cache (PersistCache): Ids of resolved entities, rows of persons.
+    rows (dict): Rows to insert by table name, persons are taken from cache.
+    last_print (int): The highest print id, null id gets the next one.
+    hashes (dict): Content hashes by print id.
+  """
+  SQL = (
+    ("person", "INSERT INTO person (id, born, died, name) VALUES (?,?,?,?)"),
+    ("score", "INSERT INTO score (id, name, genre, key, incipit, year) "
+              "VALUES (?,?,?,?,?,?)"),
+    ("score_author", "INSERT INTO score_author (score, composer) VALUES (?,?)"),
+    ("voice", "INSERT INTO voice (number, score, range, name) "
+              "VALUES (?,?,?,?)"),
+    ("edition", "INSERT INTO edition (id, score, name, year) "
+                "VALUES (?,?,?,null)"),
+    ("edition_author", "INSERT INTO edition_author (edition, editor) "
+                       "VALUES (?,?)"),
+    ("print", "INSERT INTO print (id, partiture, edition) VALUES (?,?,?)"),
+  )
+
+  def __init__(self):
+    """
+    The constructor for BulkImport class.
+    """
+    self.cache = scorelib.PersistCache()
+    self.rows = {table: [] for table, _ in self.SQL}
+    self.last_print = 0
+    self.hashes = {}
+
+
+  def add_person(self, person):
+    "This method resolves person like Person.persist and returns its id"
+    row = self.cache.persons.get(person.name)
+    if row is None:
+      row = {"id": len(self.cache.persons) + 1, "born": person.born,
+             "died": person.died}
+      self.cache.persons[person.name] = row
+      return row["id"]
+
+    if person.born is not None:
+      row["born"] = person.born
+    if person.died is not None:
+      row["died"] = person.died
+    return row["id"]
+
+
+  def add_composition(self, composition):
+    "This method resolves composition like Composition.persist"
+    res = composition.find(None, self.cache)
+    if res is not None:
+      return res["id"]
+
+    score_id = len(self.rows["score"]) + 1
+    self.rows["score"].append((score_id, composition.name, composition.genre,
+                               composition.key, composition.incipit,
+                               composition.year))
+    for auth in composition.authors:
+      self.rows["score_author"].append((score_id, self.add_person(auth)))
+    for idx, voice in enumerate(composition.voices):
+      self.rows["voice"].append((idx + 1, score_id, voice.range,
+                                 None if voice.name == "" else voice.name))
+
+    key = composition.dedup_key()
+    if key is not None:
+      self.cache.scores[key] = score_id
+    return score_id
+
+
+  def add_edition(self, edition):
+    "This method resolves edition like Edition.persist and returns its id"
+    res = edition.find(None, self.cache)
+    if res is not None:
+      return res["id"]
+
+    score_id = self.add_composition(edition.composition)
+    edition_id = len(self.rows["edition"]) + 1
+    self.rows["edition"].append((edition_id, score_id, edition.name))
+    for auth in edition.authors:
+      self.rows["edition_author"].append((edition_id, self.add_person(auth)))
+
+    key = edition.dedup_key(score_id)
+    if key is not None:
+      self.cache.editions[key] = edition_id
+    return edition_id
+
+
+  def add_print(self, prnt):
+    "This method resolves print like Print.persist"
+    if prnt.find(None, self.cache) is not None:
+      return
+
+    edition_id = self.add_edition(prnt.edition)
+    #database assigns next rowid to null primary key
+    print_id = prnt.print_id
+    if print_id is None:
+      print_id = self.last_print + 1
+    self.last_print = max(self.last_print, print_id)
+    self.cache.prints.add(print_id)
+    self.rows["print"].append((print_id, "Y" if prnt.partiture else "N",
+                               edition_id))
+    self.hashes[print_id] = prnt.content_hash()
+
+
+  def write(self, cursor):
+    "This method inserts all resolved rows"
+    self.rows["person"] = [(row["id"], row["born"], row["died"], name)
+                           for name, row in self.cache.persons.items()]
+    for table, sql in self.SQL:
+      cursor.executemany(sql, self.rows[table])
+    cursor.executemany(SQL_HASH, self.hashes.items())
+
+
+def persist_objects_bulk(database, lst, fast=False):
+  "This function resolves objects in memory and writes them in one transaction"
+  bulk = BulkImport()
+  for obj in lst:
+    bulk.add_print(obj)
+
+  con = connect(database, fast)
+  bulk.write(con.cursor())
+  disconnect(con, fast)
 
 
 #script body
 DB_SCHEMA_SCRIPT = "./scorelib.sql"
 
-#parse arguments
-FILENAME, DB = parse_args()
-#create db schema
-create_db_schema(DB, DB_SCHEMA_SCRIPT)
-#load print objects from text file
-PRINT_LIST = scorelib.load(FILENAME)
-#persist objects
-persist_objects(DB, PRINT_LIST)
+#worker processes import this module too, run only in main process
+if __name__ == "__main__":
+  #parse arguments
+  FILENAME, DB, JOBS, BULK, FAST, UPDATE, PIPELINE = parse_args()
+  #create db schema, existing database is migrated
+  create_db_schema(DB, DB_SCHEMA_SCRIPT)
+  #persist print objects as they are read from text file
+  if UPDATE:
+    COUNTS = persist_objects_incremental(DB, scorelib.iter_prints(FILENAME, JOBS),
+                                         FAST)
+    print("new: {}, changed: {}, unchanged: {}".format(*COUNTS))
+  elif BULK:
+    persist_objects_bulk(DB, scorelib.iter_prints(FILENAME, JOBS), FAST)
+  elif PIPELINE:
+    persist_objects_pipeline(DB, scorelib.iter_prints(FILENAME, JOBS), FAST)
+  else:
+    persist_objects(DB, scorelib.iter_prints(FILENAME, JOBS), FAST)
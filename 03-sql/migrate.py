@@ -0,0 +1,66 @@
+#! python3
+
+"""
+This script migrates existing database to the current schema version
+"""
+import os
+import sys
+import argparse
+import sqlite3
+
+SCHEMA_VERSION = 5
+DB_SCHEMA_SCRIPT = "./scorelib.sql"
+
+
+def eprint(*args, **kwargs):
+  "This function prints message to error output"
+  print(*args, file=sys.stderr, **kwargs)
+
+
+def parse_args():
+  "This function parses command-line arguments and does basic checks"
+  parser = argparse.ArgumentParser()
+  parser.add_argument("database", help="SQLite database file")
+
+  args = parser.parse_args()
+
+  if not os.path.isfile(args.database):
+    eprint("Database file doesn't exist")
+    exit(2)
+
+  if not os.path.isfile(DB_SCHEMA_SCRIPT):
+    eprint("Database schema not found")
+    exit(2)
+
+  return args.database
+
+
+def migrate(database, script):
+  """
+  This function applies idempotent schema script to older database
+
+  Returns: schema version of database before migration
+  """
+  con = sqlite3.connect(database)
+  version = con.execute("PRAGMA user_version").fetchone()[0]
+
+  if version < SCHEMA_VERSION:
+    with open(script, "r") as script_file:
+      try:
+        con.executescript(script_file.read())
+      except sqlite3.IntegrityError as ie:
+        con.close()
+        eprint("Database can't be migrated: {}".format(ie))
+        exit(1)
+
+  con.close()
+  return version
+
+
+#script body
+DB = parse_args()
+VERSION = migrate(DB, DB_SCHEMA_SCRIPT)
+if VERSION < SCHEMA_VERSION:
+  print("Database migrated from version {} to {}".format(VERSION, SCHEMA_VERSION))
+else:
+  print("Database is up to date (version {})".format(VERSION))
@@ -1,5 +1,35 @@
 #!/usr/bin/python3
+import os
+import hashlib
 import re
+import sys
+import mmap
+import collections
+import multiprocessing
+
+
+def normalize_name(name):
+  """
+  Returns name with collapsed whitespace used as a key of PersonIndex.
+
+  Parameters:
+    name (str): The name of the person or None.
+  """
+  if name is None:
+    return None
+  return " ".join(name.split())
+
+
+def intern_str(value):
+  """
+  Returns interned string so equal values share one object.
+
+  Parameters:
+    value (str): The string value or None.
+  """
+  if isinstance(value, str):
+    return sys.intern(value)
+  return value
 
 
 class Print:
@@ -11,7 +41,9 @@ class Print:
     edition (Edition): Instance of Edition class.
     partiture (boolean): Partiture flag.
   """
-  def __init__(self, record):
+  __slots__ = ('print_id', 'edition', 'partiture')
+
+  def __init__(self, record, persons=None):
     """
     The constructor for Print class.
 
@@ -19,7 +51,10 @@ class Print:
 
     Parameters:
 	    record (dict): Parsed record of print element.
+	    persons (PersonIndex): Index of shared persons or None.
     """
+    person = Person if persons is None else persons.get
+
     try:
       self.print_id = int(record.get('print_id'))
     except TypeError:
@@ -29,7 +64,7 @@ class Print:
 
     authors = []
     for c in record.get('composers', []):
-      authors.append(Person(c.get('name'), c.get('birth'), c.get('death')))
+      authors.append(person(c.get('name'), c.get('birth'), c.get('death')))
 
     voices = []
     for v in record.get('voices', []):
@@ -37,7 +72,7 @@ class Print:
 
     editors = []
     for e in record.get('editors', []):
-      editors.append(Person(e.get('name'), e.get('birth'), e.get('death')))
+      editors.append(person(e.get('name'), e.get('birth'), e.get('death')))
 
     composition = Composition(name=record.get('title'),
                               incipit=record.get('incipit'),
@@ -99,12 +134,47 @@ class Print:
                     self.composition().incipit or ''))
 
 
-  def find(self, cursor):
+  def content_hash(self):
+    """
+    Returns hash of the reconstructed stanza identifying content of print.
+    """
+    return hashlib.sha1(self.format().encode("utf-8")).hexdigest()
+
+
+  def frozen(self):
+    """
+    Returns copy of print with its own Person instances.
+
+    Shared persons of PersonIndex get years of records read later, the copy
+    keeps the years known when it is made.
+    """
+    def person(p):
+      return Person(p.name, p.born, p.died)
+
+    composition = self.edition.composition
+    copy = Composition(composition.name, composition.incipit, composition.key,
+                       composition.genre, composition.year, composition.voices,
+                       [person(a) for a in composition.authors])
+    frozen = Print.__new__(Print)
+    frozen.print_id = self.print_id
+    frozen.partiture = self.partiture
+    frozen.edition = Edition(copy, [person(a) for a in self.edition.authors],
+                             self.edition.name)
+    return frozen
+
+
+  def find(self, cursor, cache=None):
     """
     Internal method that try to find equal print record in database.
 
     Equality of print records depends on ID (Print number).
+    With cache the database is not queried.
     """
+    if cache is not None:
+      if self.print_id in cache.prints:
+        return {"id": self.print_id}
+      return None
+
     sql = "SELECT * FROM print WHERE id = ?"
     cursor.execute(sql, (self.print_id,))
     row = cursor.fetchone()
@@ -115,16 +185,18 @@ class Print:
     return None
 
 
-  def persist(self, cursor):
+  def persist(self, cursor, cache=None):
     sql = "INSERT INTO print (id, partiture, edition) VALUES (?,?,?)"
 
-    res = self.find(cursor)
+    res = self.find(cursor, cache)
     if res is not None:
       return res["id"]
 
-    edition_id = self.edition.persist(cursor)
+    edition_id = self.edition.persist(cursor, cache)
     cursor.execute(sql, (self.print_id, "Y" if self.partiture else "N", edition_id))
 
+    if cache is not None:
+      cache.prints.add(cursor.lastrowid)
     return cursor.lastrowid
 
 
@@ -137,6 +209,8 @@ class Person:
     born (int): Year of birth or None.
     died (int): Year of death or None.
   """
+  __slots__ = ('name', 'born', 'died')
+
   def __init__(self, name, born, died):
     """
     The constructor for Person class.
@@ -146,7 +220,7 @@ class Person:
 	    born (int): Year of birth or None.
 	    died (int): Year of death or None.
     """
-    self.name = name
+    self.name = intern_str(name)
     try:
       self.born = int(born)
     except:
@@ -174,24 +248,89 @@ class Person:
     return None
 
 
-  def persist(self, cursor):
+  def persist(self, cursor, cache=None):
     sql = "INSERT INTO person (born, died, name) VALUES (?,?,?)"
     sql_update_born = "UPDATE person SET born = ? WHERE id = ?"
     sql_update_died = "UPDATE person SET died = ? WHERE id = ?"
 
-    res = self.get_by_name(cursor)
+    if cache is None:
+      res = self.get_by_name(cursor)
+    else:
+      res = cache.persons.get(self.name)
+
     if res is None:
       cursor.execute(sql, (self.born, self.died, self.name))
+      if cache is not None:
+        cache.persons[self.name] = {"id": cursor.lastrowid, "born": self.born,
+                                    "died": self.died}
       return cursor.lastrowid
     else:
       if res["born"] != self.born and self.born is not None:
         cursor.execute(sql_update_born, (self.born, res["id"]))
+        res["born"] = self.born
       if res["died"] != self.died and self.died is not None:
         cursor.execute(sql_update_died, (self.died, res["id"]))
+        res["died"] = self.died
       return res["id"]
 
 
 
+class PersonIndex:
+  """
+  This is a class representing identity map of Person instances.
+
+  Persons are keyed by normalized name, so every occurrence of the same name
+  shares one Person instance. Years of birth and death are merged the same
+  way Person.persist merges them in database.
+
+  Attributes:
+    persons (dict): Person instances by normalized name.
+  """
+  def __init__(self):
+    """
+    The constructor for PersonIndex class.
+    """
+    self.persons = {}
+
+
+  def get(self, name, born, died):
+    """
+    Returns shared Person with given name, years update the known ones.
+
+    Parameters:
+      name (str): Name of the person.
+      born (int): Year of birth or None.
+      died (int): Year of death or None.
+    """
+    key = normalize_name(name)
+    person = self.persons.get(key)
+    if person is None:
+      person = Person(name, born, died)
+      self.persons[key] = person
+      return person
+
+    update = Person(name, born, died)
+    if update.born is not None:
+      person.born = update.born
+    if update.died is not None:
+      person.died = update.died
+    return person
+
+
+  def find(self, name):
+    """
+    Returns shared Person with given name or None.
+
+    Parameters:
+      name (str): Name of the person.
+    """
+    return self.persons.get(normalize_name(name))
+
+
+  def __len__(self):
+    return len(self.persons)
+
+
 class Voice:
   """
   This is a class representing Voice.
@@ -200,6 +339,8 @@ class Voice:
     name (str): Name of the voice or None.
     range (str): Range of the voice or None.
   """
+  __slots__ = ('name', 'range')
+
   def __init__(self, name, range):
     """
     The constructor for Voice class.
@@ -208,8 +349,8 @@ class Voice:
 	    name (str): Name of the voice or None.
 	    range (str): Range of the voice or None.
     """
-    self.name = name
-    self.range = range
+    self.name = intern_str(name)
+    self.range = intern_str(range)
 
 
   def persist(self, cursor, number, score):
@@ -242,6 +383,8 @@ class Composition:
     voices (list of Voice): The voices in this composition.
     authors (list of Person): The authors of this composition.
   """
+  __slots__ = ('name', 'incipit', 'key', 'genre', 'year', 'voices', 'authors')
+
   def __init__(self, name, incipit, key, genre, year, voices, authors):
     """
     The constructor for Composition class.
@@ -257,8 +400,8 @@ class Composition:
     """
     self.name = name
     self.incipit = incipit
-    self.key = key
-    self.genre = genre
+    self.key = intern_str(key)
+    self.genre = intern_str(genre)
     try:
       self.year = int(year)
     except:
@@ -267,13 +410,36 @@ class Composition:
     self.authors = authors
 
 
-  def find(self, cursor):
+  def dedup_key(self):
+    """
+    Returns hashable key, scores are equal when their keys are equal.
+
+    The key follows the equality of find method. Attributes compared in SQL
+    never equal to null, so None is returned when one of them is None.
+    """
+    if None in (self.name, self.incipit, self.key, self.genre):
+      return None
+
+    voices = tuple(None if voice.empty() else (voice.range, voice.name)
+                   for voice in self.voices)
+    return (self.name, self.incipit, self.key, self.genre, self.year,
+            tuple(sorted(auth.name for auth in self.authors)), voices)
+
+
+  def find(self, cursor, cache=None):
     """
     Internal method that try to find equal score record in database.
 
     Equality depends on real entities relations.
     Equality of score records depends on attributes, voices and composers.
+    With cache the database is not queried.
     """
+    if cache is not None:
+      score_id = cache.scores.get(self.dedup_key())
+      if score_id is not None:
+        return {"id": score_id}
+      return None
+
     sql = ("SELECT * FROM score WHERE name = ? and incipit = ? and key = ? "
            "and genre = ?")
     cursor.execute(sql, (self.name, self.incipit, self.key, self.genre))
@@ -319,11 +485,11 @@ class Composition:
     return None
 
 
-  def persist(self, cursor):
+  def persist(self, cursor, cache=None):
     sql = "INSERT INTO score (name, genre, key, incipit, year) VALUES (?,?,?,?,?)"
     sql_authors = "INSERT INTO score_author (score, composer) VALUES (?,?)"
 
-    res = self.find(cursor)
+    res = self.find(cursor, cache)
     if res is not None:
       return res["id"]
 
@@ -333,13 +499,17 @@ class Composition:
 
     #persist score-author relationships
     for auth in self.authors:
-      person_id = auth.persist(cursor)
+      person_id = auth.persist(cursor, cache)
       cursor.execute(sql_authors, (score_id, person_id))
 
     #persist voices
     for idx, voice in enumerate(self.voices):
       person_id = voice.persist(cursor, idx + 1, score_id)
 
+    if cache is not None:
+      key = self.dedup_key()
+      if key is not None:
+        cache.scores[key] = score_id
     return score_id
 
 
@@ -352,6 +522,7 @@ class Edition:
     authors (list of Person): The authors of the edition.
     name (str): Name of the edition or None.
   """
+  __slots__ = ('composition', 'authors', 'name')
 
   def __init__(self, composition, authors, name):
     """
@@ -364,16 +535,40 @@ class Edition:
     """
     self.composition = composition
     self.authors = authors
-    self.name = name
+    self.name = intern_str(name)
 
 
-  def find(self, cursor):
+  def dedup_key(self, score_id):
+    """
+    Returns hashable key, editions are equal when their keys are equal.
+
+    Edition name never equals to null in SQL, so None is returned for it.
+
+    Parameters:
+      score_id (int): The id of persisted composition.
+    """
+    if self.name is None or score_id is None:
+      return None
+
+    return (score_id, self.name, tuple(sorted(a.name for a in self.authors)))
+
+
+  def find(self, cursor, cache=None):
     """
     Internal method that try to find equal edition record in database.
 
     Equality depends on real entities relations.
     Equality of edition records depends on name, score and editors.
+    With cache the database is not queried.
     """
+    if cache is not None:
+      score = self.composition.find(cursor, cache)
+      edition_id = cache.editions.get(
+        self.dedup_key(score["id"] if score is not None else None))
+      if edition_id is not None:
+        return {"id": edition_id}
+      return None
+
     sql = "SELECT * FROM edition WHERE name = ?"
     cursor.execute(sql, (self.name,))
     editions = cursor.fetchall()
@@ -387,12 +582,8 @@ class Edition:
                    "WHERE sa.edition = ?")
       cursor.execute(sql_voice, (edition["id"],))
       author_names = [dict_from_row(a)["name"] for a in cursor.fetchall()]
-      if len(self.authors) != len(author_names):
+      if not names_list_equal([a.name for a in self.authors], author_names):
         continue
-      if len(author_names) > 0:
-        for auth in self.authors:
-          if auth.name not in author_names:
-            continue
 
       score = self.composition.find(cursor)
       if score is None:
@@ -403,16 +594,16 @@ class Edition:
     return None
 
 
-  def persist(self, cursor):
+  def persist(self, cursor, cache=None):
     sql = "INSERT INTO edition (score, name, year) VALUES (?,?,null)"
     sql_editors = "INSERT INTO edition_author (edition, editor) VALUES (?,?)"
 
-    res = self.find(cursor)
+    res = self.find(cursor, cache)
     if res is not None:
       return res["id"]
 
     #persist composition
-    score_id = self.composition.persist(cursor)
+    score_id = self.composition.persist(cursor, cache)
 
     #persist edition
     cursor.execute(sql, (score_id, self.name))
@@ -420,148 +611,373 @@ class Edition:
 
     #persist edition-author relationships
     for auth in self.authors:
-      person_id = auth.persist(cursor)
+      person_id = auth.persist(cursor, cache)
       cursor.execute(sql_editors, (edition_id, person_id))
 
+    if cache is not None:
+      key = self.dedup_key(score_id)
+      if key is not None:
+        cache.editions[key] = edition_id
     return edition_id
 
 
-def parse_record_line(line, record):
+class PersistCache:
   """
-  Parses record line to dictionary.
+  This is a class representing caches of entities persisted by an importer.
 
-  Parameters:
-    line (str): The record line from source file.
-    record (dict): The dictionary with parsed values.
+  When a cache is passed to persist methods, equal entities are found by
+  dictionary lookup instead of SELECT queries, so the database is only
+  written. The cache must know every row of the database, i.e. start with
+  an empty database.
+
+  Attributes:
+    persons (dict): Person rows (id, born, died) by name.
+    scores (dict): Score ids by Composition.dedup_key.
+    editions (dict): Edition ids by Edition.dedup_key.
+    prints (set): Ids of persisted prints.
   """
-  def parse_partiture(data):
-    if re.search(r'yes|true|True|Yes', data):
-      return True
-    return False
+  def __init__(self):
+    """
+    The constructor for PersistCache class.
+    """
+    self.persons = {}
+    self.scores = {}
+    self.editions = {}
+    self.prints = set()
 
-  def parse_composers(line):
-    "This function parses all composers from line"
-    composers_list = []
-    composers = re.split(";", line.strip())
-    for composer in composers:
-      if not composer:
-        continue
-      item = {}
-      item["name"] = re.sub(r'[(].*[)]', '', composer).strip()
 
-      dates = re.search(r'[(](\d{4})?-?-?(\d{4})?[)]', composer)
+  def fill(self, cursor):
+    """
+    Loads all entities already stored in database into the cache.
+
+    Each table is read by a single query, so the cache can be used with
+    a non-empty database.
+    """
+    cursor.execute("SELECT * FROM person")
+    names = {}
+    for row in cursor.fetchall():
+      names[row["id"]] = row["name"]
+      self.persons.setdefault(row["name"], {"id": row["id"],
+                                            "born": row["born"],
+                                            "died": row["died"]})
+
+    authors = {}
+    cursor.execute("SELECT score, composer FROM score_author ORDER BY id")
+    for row in cursor.fetchall():
+      authors.setdefault(row["score"], []).append(
+        Person(names[row["composer"]], None, None))
+
+    voices = {}
+    cursor.execute("SELECT score, range, name FROM voice ORDER BY score, number")
+    for row in cursor.fetchall():
+      voices.setdefault(row["score"], []).append(Voice(row["name"], row["range"]))
+
+    cursor.execute("SELECT * FROM score ORDER BY id")
+    for row in cursor.fetchall():
+      composition = Composition(row["name"], row["incipit"], row["key"],
+                                row["genre"], row["year"],
+                                voices.get(row["id"], []),
+                                authors.get(row["id"], []))
+      key = composition.dedup_key()
+      if key is not None:
+        self.scores.setdefault(key, row["id"])
+
+    editors = {}
+    cursor.execute("SELECT edition, editor FROM edition_author ORDER BY id")
+    for row in cursor.fetchall():
+      editors.setdefault(row["edition"], []).append(
+        Person(names[row["editor"]], None, None))
+
+    cursor.execute("SELECT * FROM edition ORDER BY id")
+    for row in cursor.fetchall():
+      edition = Edition(None, editors.get(row["id"], []), row["name"])
+      key = edition.dedup_key(row["score"])
+      if key is not None:
+        self.editions.setdefault(key, row["id"])
+
+    cursor.execute("SELECT id FROM print")
+    self.prints.update(row["id"] for row in cursor.fetchall())
+
+
+RGX_PARTITURE = re.compile(r'yes|true|True|Yes')
+RGX_PARENTHESES = re.compile(r'[(].*[)]')
+RGX_DATES_RANGE = re.compile(r'[(](\d{4})?-?-?(\d{4})?[)]')
+RGX_DATES_SIGN = re.compile(r'[(]([+*])(\d{4})[)]')
+RGX_DATES_DEATH = re.compile(r'[(][^-]*-?-?(\d{4})[)]')
+RGX_DATES_BIRTH = re.compile(r'[(](\d{4})-?-?.*[)]')
+RGX_VOICE = re.compile(r'(?P<range>\w+--\w+)[,;]?(?P<name>.*)')
+RGX_EDITORS = re.compile(r'([\w.]+,?\s{1}[\w.]+)')
+RGX_WORD = re.compile(r'(\w+)')
+RGX_DIGITS = re.compile(r'[^\d]*(\d+)')
+RGX_YEAR = re.compile(r'.*(\d{4})')
+
+
+def parse_partiture(data):
+  "This function parses partiture flag"
+  if RGX_PARTITURE.search(data):
+    return True
+  return False
+
+
+def parse_composers(line):
+  "This function parses all composers from line"
+  composers_list = []
+  for composer in line.strip().split(";"):
+    if not composer:
+      continue
+    item = {}
+    item["name"] = RGX_PARENTHESES.sub('', composer).strip()
+
+    dates = RGX_DATES_RANGE.search(composer)
+    if dates:
+      item["birth"] = dates.group(1)
+      item["death"] = dates.group(2)
+    else:
+      dates = RGX_DATES_SIGN.search(composer)
       if dates:
-        item["birth"] = dates.group(1)
-        item["death"] = dates.group(2)
+        if dates.group(1) == '*':
+          item["birth"] = dates.group(2)
+        else:
+          item["death"] = dates.group(2)
       else:
-        dates = re.search(r'[(]([+*])(\d{4})[)]', composer)
+        dates = RGX_DATES_DEATH.search(composer)
         if dates:
-          if dates.group(1) == '*':
-            item["birth"] = dates.group(2)
-          else:
-            item["death"] = dates.group(2)
+          item["death"] = dates.group(1)
         else:
-          dates = re.search(r'[(][^-]*-?-?(\d{4})[)]', composer)
+          dates = RGX_DATES_BIRTH.search(composer)
           if dates:
-            item["death"] = dates.group(1)
-          else:
-            dates = re.search(r'[(](\d{4})-?-?.*[)]', composer)
-            if dates:
-              item["birth"] = dates.group(1)
-
-      composers_list.append(item)
-    return composers_list
-
-  def parse_voice(line, record):
-    "This function parses all voices from line"
-    voice = {}
-    res = re.search(r'(?P<range>\w+--\w+)[,;]?(?P<name>.*)', line)
-    if res:
-      if res.group("name"):
-        voice["name"] = res.group("name").strip()
-      voice["range"] = res.group("range").strip()
-    else:
-      voice["name"] = line
+            item["birth"] = dates.group(1)
 
-    if record.get("voices"):
-      record["voices"].append(voice)
-    else:
-      record["voices"] = [voice]
-
-  def parse_editors(line):
-    "This function parses all editors from line"
-    editors_list = []
-    editors = re.findall(r'([\w.]+,?\s{1}[\w.]+)', line)
-    if not editors:
-      editor = re.search(r'(\w+)', line)
-      if editor:
-        editors_list.append({"name": editor.group(1)})
-    else:
-      for editor in editors:
-        editors_list.append({"name": editor})
+    composers_list.append(item)
+  return composers_list
 
-    return editors_list
 
+def parse_voice(line, record):
+  "This function parses voice from line"
+  voice = {}
+  res = RGX_VOICE.search(line)
+  if res:
+    if res.group("name"):
+      voice["name"] = res.group("name").strip()
+    voice["range"] = res.group("range").strip()
+  else:
+    voice["name"] = line
 
-  pritnNr = re.match(r'^Print Number:[^\d]*(\d+).*', line)
-  if pritnNr:
-    record["print_id"] = pritnNr.group(1)
-    return
+  if record.get("voices"):
+    record["voices"].append(voice)
+  else:
+    record["voices"] = [voice]
 
-  partiture = re.match(r'^Partiture:(.*)', line)
-  if partiture:
-    record["partiture"] = parse_partiture(partiture.group(1))
-    return
 
-  title = re.match(r'^Title:(.*)', line)
-  if title:
-    record["title"] = title.group(1).strip()
-    return
+def parse_editors(line):
+  "This function parses all editors from line"
+  editors_list = []
+  editors = RGX_EDITORS.findall(line)
+  if not editors:
+    editor = RGX_WORD.search(line)
+    if editor:
+      editors_list.append({"name": editor.group(1)})
+  else:
+    for editor in editors:
+      editors_list.append({"name": editor})
 
-  incipit = re.match(r'^Incipit:(.*)', line)
-  if incipit:
-    record["incipit"] = incipit.group(1).strip()
-    return
+  return editors_list
 
-  key = re.match(r'^Key:(.*)', line)
-  if key:
-    record["key"] = key.group(1).strip()
-    return
 
-  genre = re.match(r'^Genre:(.*)', line)
-  if genre:
-    record["genre"] = genre.group(1).strip()
-    return
+def parse_field_print_number(value, record):
+  "This function parses print number field value"
+  print_nr = RGX_DIGITS.match(value)
+  if print_nr:
+    record["print_id"] = print_nr.group(1)
 
-  compositionYear = re.match(r'^Composition Year:.*(\d{4}).*', line)
-  if compositionYear:
-    record["composition_year"] = compositionYear.group(1)
-    return
 
-  edition = re.match(r'^Edition:(.*)', line)
-  if edition:
-    record["edition_name"] = edition.group(1).strip()
-    return
+def parse_field_composition_year(value, record):
+  "This function parses composition year field value"
+  year = RGX_YEAR.match(value)
+  if year:
+    record["composition_year"] = year.group(1)
+
+
+def parse_field_partiture(value, record):
+  "This function parses partiture field value"
+  record["partiture"] = parse_partiture(value)
+
+
+def parse_field_editors(value, record):
+  "This function parses editor field value"
+  record["editors"] = parse_editors(value.strip())
+
+
+def parse_field_composers(value, record):
+  "This function parses composer field value"
+  record["composers"] = parse_composers(value.strip())
+
+
+def field_parser_strip(key):
+  "This function returns parser storing stripped field value under given key"
+  def parse_field(value, record):
+    record[key] = value.strip()
+  return parse_field
+
+
+def parse_field_voice(value, record):
+  "This function parses voice field value"
+  voice = value.strip()
+  if voice != "":
+    parse_voice(voice, record)
+
+
+#parsers of record fields keyed by field name (text before the first colon)
+FIELD_PARSERS = {
+  "Print Number": parse_field_print_number,
+  "Partiture": parse_field_partiture,
+  "Title": field_parser_strip("title"),
+  "Incipit": field_parser_strip("incipit"),
+  "Key": field_parser_strip("key"),
+  "Genre": field_parser_strip("genre"),
+  "Composition Year": parse_field_composition_year,
+  "Edition": field_parser_strip("edition_name"),
+  "Editor": parse_field_editors,
+  "Composer": parse_field_composers,
+}
 
-  editors = re.match(r'^Editor:(.*)', line)
-  if editors:
-    record["editors"] = parse_editors(editors.group(1).strip())
-    return
 
-  composers = re.match(r'^Composer:(.*)', line)
-  if composers:
-    record["composers"] = parse_composers(composers.group(1).strip())
+def parse_record_line(line, record):
+  """
+  Parses record line to dictionary.
+
+  The line is split on the first colon only once and the value is passed
+  to the parser of its field found in FIELD_PARSERS.
+
+  Parameters:
+    line (str): The record line from source file.
+    record (dict): The dictionary with parsed values.
+  """
+  field, sep, value = line.partition(":")
+  if not sep:
     return
 
-  voice_match = re.match(r'^Voice \d+:(.*)', line)
-  if voice_match:
-    voice = voice_match.group(1).strip()
-    if voice != "":
-      parse_voice(voice, record)
+  parser = FIELD_PARSERS.get(field)
+  if parser is not None:
+    parser(value, record)
+  elif field.startswith("Voice ") and field[6:].isdigit():
+    parse_field_voice(value, record)
+
+
+#bytes of source file parsed by one worker task, and tasks in flight per
+#worker, so parallel parsing holds only a window of the file in memory
+CHUNK_SIZE = 1 << 20
+CHUNK_WINDOW = 2
+
+
+def find_blank_line(data, pos):
+  """
+  Returns the offset after the first empty line following offset pos.
+
+  A line is empty when it has only its end, LF or CRLF.
+
+  Parameters:
+    data (mmap): The memory-mapped file.
+    pos (int): The offset where searching starts.
+
+  Returns:
+    int offset or -1 if there is no empty line
+  """
+  eol = data.find(b"\n", pos)
+  while eol != -1:
+    line = eol + 1
+    if data[line:line + 1] == b"\n":
+      return line + 1
+    if data[line:line + 2] == b"\r\n":
+      return line + 2
+    eol = data.find(b"\n", line)
+  return -1
+
+
+def find_record_chunks(filename, count):
+  """
+  Splits the file into byte ranges on blank-line record boundaries.
+
+  Parameters:
+    filename (str): The filename of source file.
+    count (int): The requested number of chunks.
+
+  Returns:
+    list of (start, end) tuples covering the whole file
+  """
+  size = os.path.getsize(filename)
+  if count < 2 or size == 0:
+    return [(0, size)]
+
+  bounds = [0]
+  with open(filename, 'rb') as file:
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+      for idx in range(1, count):
+        pos = find_blank_line(data, max(size * idx // count, bounds[-1]))
+        if pos == -1:
+          break
+        if pos > bounds[-1]:
+          bounds.append(pos)
+
+  if bounds[-1] < size:
+    bounds.append(size)
+  return list(zip(bounds, bounds[1:]))
+
+
+#field names of the lines parse_record_line understands, numbered fields
+#like 'Voice 1' are listed without their number
+RECORD_FIELDS = frozenset([b"Print Number", b"Partiture", b"Title", b"Incipit",
+                           b"Key", b"Genre", b"Composition Year", b"Edition",
+                           b"Editor", b"Composer", b"Voice"])
+
+
+def scan_records(filename, fields=RECORD_FIELDS, start=0, end=None):
+  """
+  Lazy function (generator) to scan a memory-mapped file record by record.
+
+  Record boundaries and field names are found on raw bytes, only lines of
+  the requested fields are decoded. Records are separated by an empty line
+  ending with LF or CRLF.
+
+  Parameters:
+    filename (str): The filename of source file.
+    fields (set of bytes): The requested field names, numbered fields are
+      matched by their name without number.
+    start (int): The offset where scanning starts, must start a record.
+    end (int): The offset where scanning stops or None for end of file.
+
+  Returns:
+    list of decoded lines (str) of the requested fields in one record
+  """
+  if os.path.getsize(filename) == 0:
     return
 
+  with open(filename, 'rb') as file:
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+      end = len(data) if end is None else end
+      pos = start
+      lines = []
+      while pos < end:
+        eol = data.find(b"\n", pos, end)
+        if eol == -1:
+          eol = end
+        if eol - pos < 2 and data[pos:eol] in (b"", b"\r"):
+          #empty line (LF or CRLF) ends the record
+          yield lines
+          lines = []
+        else:
+          colon = data.find(b":", pos, eol)
+          if colon != -1:
+            name = data[pos:colon]
+            if name in fields or name.rstrip(b"0123456789 ") in fields:
+              lines.append(data[pos:eol].decode("utf-8").rstrip("\r"))
+        pos = eol + 1
+
+      if lines:
+        yield lines
+
 
-def read_in_records(filename):
+def read_in_records(filename, start=0, end=None):
   """
   Lazy function (generator) to read a file record by record.
 
@@ -569,38 +985,91 @@ def read_in_records(filename):
 
   Parameters:
     filename (str): The filename of source file.
+    start (int): The offset where reading starts, must start a record.
+    end (int): The offset where reading stops or None for end of file.
 
   Returns:
     dict representing parsed record
   """
-  record = {}
-  with open(filename, 'r', encoding="utf-8") as file:
-    for line in file:
-      if line == "\n":
-        yield record
-        record = {}
-
+  for lines in scan_records(filename, RECORD_FIELDS, start, end):
+    record = {}
+    for line in lines:
       parse_record_line(line, record)
+    yield record
 
-  yield record
 
+def read_chunk_records(args):
+  """
+  Parses one chunk of the file in a worker process.
 
-def load(filename):
+  Parameters:
+    args (tuple): The filename, start and end offset of the chunk.
+
+  Returns:
+    list of non-empty parsed records
   """
-  Reads and parses the text file and returns a list of Print instances.
+  filename, start, end = args
+  return [record for record in read_in_records(filename, start, end) if record]
+
+
+def iter_prints(filename, jobs=1, persons=None):
+  """
+  Lazy function (generator) to read Print instances record by record.
+
+  Each Print is constructed as soon as its record is parsed. With more jobs
+  the file is split on record boundaries and the chunks are parsed by a pool
+  of worker processes, Prints are yielded in the file order chunk by chunk.
+
+  Composers and editors of the same name share one Person instance, with
+  years merged like in database.
 
   Parameters:
     filename (str): The filename of source file.
+    jobs (int): The number of worker processes.
+    persons (PersonIndex): Index of shared persons, new one if None.
 
   Returns:
-    list of Print instances sorted by print_id
+    Print instance
   """
-  records = []
+  if persons is None:
+    persons = PersonIndex()
+
+  if jobs > 1:
+    #chunks are submitted in a bounded window, so workers parse only a few
+    #chunks ahead of the consumer
+    chunks = find_record_chunks(
+      filename, max(jobs * 4, os.path.getsize(filename) // CHUNK_SIZE))
+    with multiprocessing.Pool(min(jobs, len(chunks))) as pool:
+      pending = collections.deque()
+      for start, end in chunks:
+        if len(pending) >= jobs * CHUNK_WINDOW:
+          for record in pending.popleft().get():
+            yield Print(record, persons)
+        pending.append(pool.apply_async(read_chunk_records,
+                                        ((filename, start, end),)))
+      while pending:
+        for record in pending.popleft().get():
+          yield Print(record, persons)
+    return
+
   for record in read_in_records(filename):
     if record:
-      records.append(Print(record))
+      yield Print(record, persons)
+
+
+def load(filename, jobs=1, persons=None):
+  """
+  Reads and parses the text file and returns a list of Print instances.
 
-  return records
+  Parameters:
+    filename (str): The filename of source file.
+    jobs (int): The number of worker processes.
+    persons (PersonIndex): Index of shared persons, new one if None.
+
+  Returns:
+    list of Print instances sorted by print_id
+  """
+  return list(iter_prints(filename, jobs, persons))
 
 
 def dict_from_row(row):
@@ -1,55 +1,140 @@
 -- A table that stores a person: could be either a composer or an editor.
-create table person ( id integer primary key not null,
-                      born integer,
-                      died integer,
-                      name varchar not null );
+create table if not exists person ( id integer primary key not null,
+                                    born integer,
+                                    died integer,
+                                    name varchar not null );
 
 -- Stores info about a single score. Since some of the scores in the library
 -- have multiple compositions in them, author data is stored in a separate
 -- table (score_author). The relationship between authors and scores is M:N
 -- since most composers have more than one composition to their name. Year in
 -- this table refers to the field 'Composition Year' in the text file.
-create table score ( id integer primary key not null,
-                     name varchar,
-                     genre varchar,
-                     key varchar,
-                     incipit varchar,
-                     year integer );
+create table if not exists score ( id integer primary key not null,
+                                   name varchar,
+                                   genre varchar,
+                                   key varchar,
+                                   incipit varchar,
+                                   year integer );
 
 -- Information about the voices in a particular score. Scores often contain
 -- multiple voices, hence a separate table. The relationship is 1:N (each row
 -- in the voice table belongs to exactly one score). The 'number' column
 -- refers to the voice number, i.e. it's 1 for a line starting 'Voice 1:'.
-create table voice ( id integer primary key not null,
-                     number integer not null, -- which voice this is
-                     score integer references score( id ) not null,
-                     range varchar,
-                     name varchar );
+create table if not exists voice ( id integer primary key not null,
+                                   number integer not null, -- which voice this is
+                                   score integer references score( id ) not null,
+                                   range varchar,
+                                   name varchar );
 
 -- Multiple editions of a given score may exist, and any given edition could
 -- have multiple editors. Like with score -- author relationship, this is M:N
 -- and stored in an auxiliary table, edition_author.
-create table edition ( id integer primary key not null,
-                       score integer references score( id ) not null,
-                       name varchar,
-                       year integer );
+create table if not exists edition ( id integer primary key not null,
+                                     score integer references score( id ) not null,
+                                     name varchar,
+                                     year integer );
 
 -- Auxiliary table. See 'score'.
-create table score_author( id integer primary key not null,
-                           score integer references score( id ) not null,
-                           composer integer references person( id ) not null );
+create table if not exists score_author( id integer primary key not null,
+                                         score integer references score( id ) not null,
+                                         composer integer references person( id ) not null );
 
 -- Auxiliary table. See 'edition'.
-create table edition_author( id integer primary key not null,
-                             edition integer references edition( id ) not null,
-                             editor integer references person( id ) not null );
+create table if not exists edition_author( id integer primary key not null,
+                                           edition integer references edition( id ) not null,
+                                           editor integer references person( id ) not null );
 
 -- Information about a printed score. This is always of a particular edition,
 -- so we refer to that. The partiture column describes whether a partiture is
 -- part of the print. In all the above tables, 'id' is an auto-generated
 -- primary key. For print, however, this is the value of the 'Print Number'
 -- field from the text file.
-create table print ( id integer primary key not null,
-                     partiture char(1) default 'N' not null, -- N = No, Y = Yes, P = Partial
-                     edition integer references edition( id ) );
+create table if not exists print ( id integer primary key not null,
+                                   partiture char(1) default 'N' not null, -- N = No, Y = Yes, P = Partial
+                                   edition integer references edition( id ) );
 
+-- Content hash of the text record of each print (schema version 3). It lets
+-- an incremental import skip prints which did not change since last import.
+create table if not exists print_hash ( print integer primary key references print( id ) not null,
+                                        hash varchar not null );
+
+-- Indexes (schema version 2). Foreign key columns are indexed together with
+-- the other column of the auxiliary tables, so joins in both directions are
+-- covered by the index alone. A person is identified by name. Scores and
+-- editions are deduplicated by the importer in memory, their names are not
+-- indexed (score_name and edition_name of version 2 are dropped in version 5).
+create unique index if not exists person_name on person( name );
+drop index if exists score_name;
+create index if not exists voice_score on voice( score, number );
+create index if not exists edition_score on edition( score );
+drop index if exists edition_name;
+create index if not exists score_author_score on score_author( score, composer );
+create index if not exists score_author_composer on score_author( composer, score );
+create index if not exists edition_author_edition on edition_author( edition, editor );
+create index if not exists edition_author_editor on edition_author( editor, edition );
+create index if not exists print_edition on print( edition );
+
+-- Full-text index (schema version 4) of person names and score titles and
+-- incipits, used by search. Both are external content tables, they store only
+-- the index and read the text from person and score. Triggers keep the index
+-- in sync with every insert, update and delete of the indexed rows.
+create virtual table if not exists person_fts using fts5( name,
+                                                          content='person',
+                                                          content_rowid='id',
+                                                          tokenize='unicode61 remove_diacritics 2' );
+create virtual table if not exists score_fts using fts5( name,
+                                                         incipit,
+                                                         content='score',
+                                                         content_rowid='id',
+                                                         tokenize='unicode61 remove_diacritics 2' );
+
+create trigger if not exists person_fts_insert after insert on person begin
+  insert into person_fts( rowid, name ) values ( new.id, new.name );
+end;
+create trigger if not exists person_fts_delete after delete on person begin
+  insert into person_fts( person_fts, rowid, name ) values ( 'delete', old.id, old.name );
+end;
+create trigger if not exists person_fts_update after update of name on person begin
+  insert into person_fts( person_fts, rowid, name ) values ( 'delete', old.id, old.name );
+  insert into person_fts( rowid, name ) values ( new.id, new.name );
+end;
+
+create trigger if not exists score_fts_insert after insert on score begin
+  insert into score_fts( rowid, name, incipit ) values ( new.id, new.name, new.incipit );
+end;
+create trigger if not exists score_fts_delete after delete on score begin
+  insert into score_fts( score_fts, rowid, name, incipit ) values ( 'delete', old.id, old.name, old.incipit );
+end;
+create trigger if not exists score_fts_update after update of name, incipit on score begin
+  insert into score_fts( score_fts, rowid, name, incipit ) values ( 'delete', old.id, old.name, old.incipit );
+  insert into score_fts( rowid, name, incipit ) values ( new.id, new.name, new.incipit );
+end;
+
+-- Rows stored before version 4 are indexed once, when the database is migrated.
+insert into person_fts( person_fts ) select 'rebuild' where ( select user_version from pragma_user_version ) < 4;
+insert into score_fts( score_fts ) select 'rebuild' where ( select user_version from pragma_user_version ) < 4;
+
+-- Trigram index (schema version 5) of person names, used by search for
+-- case-insensitive substring lookup, name LIKE '%...%' is matched by the index.
+create virtual table if not exists person_trigram using fts5( name,
+                                                              content='person',
+                                                              content_rowid='id',
+                                                              tokenize='trigram' );
+
+create trigger if not exists person_trigram_insert after insert on person begin
+  insert into person_trigram( rowid, name ) values ( new.id, new.name );
+end;
+create trigger if not exists person_trigram_delete after delete on person begin
+  insert into person_trigram( person_trigram, rowid, name ) values ( 'delete', old.id, old.name );
+end;
+create trigger if not exists person_trigram_update after update of name on person begin
+  insert into person_trigram( person_trigram, rowid, name ) values ( 'delete', old.id, old.name );
+  insert into person_trigram( rowid, name ) values ( new.id, new.name );
+end;
+
+-- Rows stored before version 5 are indexed once, when the database is migrated.
+insert into person_trigram( person_trigram ) select 'rebuild' where ( select user_version from pragma_user_version ) < 5;
+
+-- All statements above are idempotent, running this script on a database of
+-- an older version migrates it to the current one.
+pragma user_version = 5;
@@ -0,0 +1,64 @@
+#! python3
+
+"""
+This script measures number of queries and latency of composer search
+"""
+import sys
+import time
+import argparse
+import sqlite3
+from search import search, DB_FILE
+
+
+def eprint(*args, **kwargs):
+  "This function prints message to error output"
+  print(*args, file=sys.stderr, **kwargs)
+
+
+def parse_args():
+  "This function parses command-line arguments and does basic checks"
+  parser = argparse.ArgumentParser()
+  parser.add_argument("composer", nargs="*", default=["Bach"],
+                      help="Composer's name substrings to search")
+  parser.add_argument("-r", "--repeat", type=int, default=20,
+                      help="number of timed searches, the fastest is reported")
+
+  args = parser.parse_args()
+
+  return args.composer, args.repeat
+
+
+def bench_search(con, composer, repeat):
+  """
+  This function searches composer repeatedly
+
+  Returns: number of executed statements, best latency in ms, prints found
+  """
+  statements = []
+  con.set_trace_callback(statements.append)
+  found = search(con.cursor(), composer)
+  con.set_trace_callback(None)
+
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    search(con.cursor(), composer)
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+
+  return len(statements), best * 1000, sum(len(p) for p in found.values())
+
+
+#script body
+COMPOSERS, REPEAT = parse_args()
+
+CON = sqlite3.connect(DB_FILE)
+CON.row_factory = sqlite3.Row
+
+print("{:<20} {:>8} {:>8} {:>12}".format("composer", "prints", "queries",
+                                         "latency [ms]"))
+for COMPOSER in COMPOSERS:
+  QUERIES, LATENCY, PRINTS = bench_search(CON, COMPOSER, REPEAT)
+  print("{:<20} {:>8} {:>8} {:>12.2f}".format(COMPOSER, PRINTS, QUERIES, LATENCY))
+
+CON.close()
@@ -0,0 +1,78 @@
+#! python3
+
+"""
+This script compares lookups per second of getprint.py processes and server
+with and without result cache
+"""
+import sys
+import time
+import argparse
+import threading
+import subprocess
+import http.client
+from os import path
+from server import make_server
+from search import DB_FILE
+
+
+def eprint(*args, **kwargs):
+  "This function prints message to error output"
+  print(*args, file=sys.stderr, **kwargs)
+
+
+def parse_args():
+  "This function parses command-line arguments and does basic checks"
+  parser = argparse.ArgumentParser()
+  parser.add_argument("-n", "--lookups", type=int, default=2000,
+                      help="number of lookups sent to server")
+  parser.add_argument("-s", "--scripts", type=int, default=20,
+                      help="number of getprint.py processes run")
+
+  args = parser.parse_args()
+
+  if not path.isfile(DB_FILE):
+    eprint("Database file doesn't exist")
+    exit(2)
+
+  return args.lookups, args.scripts
+
+
+def bench_scripts(count):
+  "This function returns lookups per second of one process per lookup"
+  start = time.perf_counter()
+  for idx in range(count):
+    subprocess.run([sys.executable, "getprint.py", str(idx + 1)],
+                   stdout=subprocess.DEVNULL, check=True)
+  return count / (time.perf_counter() - start)
+
+
+def bench_server(count, url, cache_size=0):
+  "This function returns lookups per second of one kept-alive connection"
+  server = make_server(DB_FILE, "127.0.0.1", 0, 1, cache_size)
+  thread = threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+
+  client = http.client.HTTPConnection(*server.server_address)
+  start = time.perf_counter()
+  for idx in range(count):
+    client.request("GET", url.format(idx + 1))
+    client.getresponse().read()
+  elapsed = time.perf_counter() - start
+
+  client.close()
+  server.shutdown()
+  server.server_close()
+  server.pool.close()
+  return count / elapsed
+
+
+#script body
+LOOKUPS, SCRIPTS = parse_args()
+
+print("getprint.py: {:.0f} lookups/s".format(bench_scripts(SCRIPTS)))
+print("server getprint: {:.0f} lookups/s".format(
+  bench_server(LOOKUPS, "/getprint/{}")))
+print("server search: {:.0f} lookups/s".format(
+  bench_server(LOOKUPS // 10, "/search/Bach")))
+print("server search cached: {:.0f} lookups/s".format(
+  bench_server(LOOKUPS, "/search/Bach", 1)))
@@ -39,7 +39,13 @@ def dict_from_row(row):
   return dict(zip(row.keys(), row))
 
 
-def get_print_authors(database, print_id):
+def get_print_authors(cursor, print_id):
+  """
+  This function returns composers of given print
+
+  Returns:
+    list of dicts representing persons
+  """
   sql = ("select p.* from print pr "
          "join edition e on pr.edition = e.id "
          "join score s on e.score = s.id "
@@ -47,34 +53,35 @@ def get_print_authors(database, print_id):
          "join person p on sa.composer = p.id "
          "where pr.id = ?")
 
-  con = sqlite3.connect(database)
-  con.row_factory = sqlite3.Row
-  cur = con.cursor()
-
-  cur.execute(sql, (print_id,))
-  authors = [dict_from_row(row) for row in cur.fetchall()]
+  cursor.execute(sql, (print_id,))
+  return [dict_from_row(row) for row in cursor.fetchall()]
 
-  con.close()
-  return authors
 
-
-def nice_print(authors):
+def strip_authors(authors):
+  "This function removes id and unknown dates of authors"
   for a in authors:
     a.pop('id', None)
     if a["born"] is None:
       a.pop('born', None)
     if a["died"] is None:
       a.pop('died', None)
+  return authors
 
-  print(json.dumps(authors, indent=2, ensure_ascii=False))
+
+def nice_print(authors):
+  print(json.dumps(strip_authors(authors), indent=2, ensure_ascii=False))
 
 
 #script body
 DB_FILE = "./scorelib.dat"
 
-#parse arguments
-print_id = parse_args()
-#load author objects from database
-author_list = get_print_authors(DB_FILE, print_id)
-#print authors nicely
-nice_print(author_list)
+if __name__ == "__main__":
+  #parse arguments
+  print_id = parse_args()
+  #load author objects from database
+  con = sqlite3.connect(DB_FILE)
+  con.row_factory = sqlite3.Row
+  author_list = get_print_authors(con.cursor(), print_id)
+  con.close()
+  #print authors nicely
+  nice_print(author_list)
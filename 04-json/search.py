@@ -3,12 +3,23 @@
 """
 This script search for Print records where the given Composer participates
 Each record is printed as JSON structure
-Composer is given as his name subtring
+Composer is given as a part of his name, with -p option as prefixes of its
+words, with -t option Prints of scores matching title or incipit are searched
+instead
 """
 import sys
 import argparse
 import sqlite3
 import json
+import re
+
+#maximal number of ids bound to one IN (...) list, SQLite limits variables
+IN_CHUNK = 500
+
+#number of prints fetched and completed at once when they are streamed
+PRINT_BATCH = 100
+
+RGX_WORD = re.compile(r"\w+")
 
 
 def eprint(*args, **kwargs):
@@ -19,11 +30,18 @@ def eprint(*args, **kwargs):
 def parse_args():
   "This function parses command-line arguments and does basic checks"
   parser = argparse.ArgumentParser()
-  parser.add_argument("composer", help="Composer's name substring")
+  parser.add_argument("composer", help="Part of composer's name")
+  parser.add_argument("-p", "--prefix", action="store_true",
+                      help="match prefixes of name words, composers are "
+                      "ordered by relevance")
+  parser.add_argument("-t", "--title", action="store_true",
+                      help="search score titles and incipits instead")
+  parser.add_argument("-l", "--lines", action="store_true",
+                      help="write JSON Lines, one print per line")
 
   args = parser.parse_args()
 
-  return args.composer
+  return args.composer, args.title, args.lines, args.prefix
 
 
 def dict_from_row(row):
@@ -41,57 +59,153 @@ def dict_from_row(row):
   return dict(zip(row.keys(), row))
 
 
-def get_composers_id(cursor, composer):
+def fts_query(text):
+  """
+  This function converts searched text to full-text query
+
+  Every word of the text has to prefix some word of the indexed column, words
+  are quoted so FTS5 operators in the text are matched literally.
+
+  Returns: FTS5 match expression, None when text contains no words
   """
-  This funtion finds and return composers matching given name substring
+  words = RGX_WORD.findall(text)
+  if not words:
+    return None
+  return " ".join('"{}"*'.format(word) for word in words)
+
+
+def get_composers_id(cursor, composer, prefix=False):
+  """
+  This funtion finds and return composers matching given name
+
+  Name is matched as case-insensitive substring by trigram index, composers
+  are ordered by name. With prefix, words of the name are matched as prefixes
+  in full-text index and composers are ordered by relevance. Database without
+  the index (schema older than version 5, or 4 for prefix) is searched by
+  name substring.
 
   Returns:
     list of composers 
   """
-  sql_composer_match = ("select p.id, p.name from person p "
+  sql_composer_trigram = ("select p.id, p.name from person_trigram t "
+                          "join person p on p.id = t.rowid "
+                          "where t.name like ? "
+                          "and exists (select 1 from score_author s "
+                          "where s.composer = p.id) "
+                          "order by p.name")
+
+  sql_composer_fts = ("select p.id, p.name from person_fts f "
+                      "join person p on p.id = f.rowid "
+                      "where person_fts match ? "
+                      "and exists (select 1 from score_author s "
+                      "where s.composer = p.id) "
+                      "order by f.rank")
+
+  sql_composer_match = ("select distinct p.id, p.name from person p "
                         "join score_author s on s.composer = p.id "
-                        "where p.name like ?")
-  
-  cursor.execute(sql_composer_match, ('%'+composer+'%',))
+                        "where p.name like ? "
+                        "order by p.name")
+
+  if prefix:
+    query = fts_query(composer)
+    if query is None:
+      return []
+    sql, args = sql_composer_fts, (query,)
+  else:
+    sql, args = sql_composer_trigram, ('%'+composer+'%',)
+
+  try:
+    cursor.execute(sql, args)
+  except sqlite3.OperationalError:
+    cursor.execute(sql_composer_match, ('%'+composer+'%',))
   return [dict_from_row(row) for row in cursor.fetchall()]
 
 
-def get_print_by_composer(cursor, composer_id):
-  """Return list of Prints where composer participates"""
+def get_scores_id(cursor, title):
+  """
+  This funtion finds scores whose title or incipit matches given text
 
-  sql = ("select pr.id as 'Print Number',"
-         "pr.partiture as Partiture,"
-         "s.name as Title,"
-         "s.genre as Genre,"
-         "s.key as Key,"
-         "s.incipit as Incipit,"
-         "s.year as 'Composition Year',"
-         "e.name as 'Edition',"
-         "s.id as score_id,"
-         "e.id as edition_id "
-         "from print pr "
-         "join edition e on pr.edition = e.id "
-         "join score s on e.score = s.id "
-         "join score_author sa on sa.score = s.id "
-         "where sa.composer = ?")
+  Returns:
+    list of score ids ordered by relevance
+  """
+  sql_score_fts = ("select rowid from score_fts "
+                   "where score_fts match ? "
+                   "order by rank")
+
+  query = fts_query(title)
+  if query is None:
+    return []
+
+  cursor.execute(sql_score_fts, (query,))
+  return [row[0] for row in cursor.fetchall()]
+
+
+def chunked(ids):
+  "This function splits list of ids to parts bound to one IN list"
+  for idx in range(0, len(ids), IN_CHUNK):
+    yield ids[idx:idx + IN_CHUNK]
+
+
+def fetch_grouped(cursor, sql, ids):
+  """
+  This function runs query with IN list over all ids, rows are grouped
+
+  The query selects grouping id as its first column and contains {} where
+  placeholders of the IN list belong.
+
+  Returns: dict of lists of rows (without grouping id) by grouping id
+  """
+  grouped = {}
+  for part in chunked(ids):
+    cursor.execute(sql.format(",".join("?" * len(part))), part)
+    for row in cursor.fetchall():
+      row = dict_from_row(row)
+      grouped.setdefault(row.pop("group_id"), []).append(row)
+  return grouped
+
+
+#columns of prints selected by queries grouping them, group_id is put first
+SQL_PRINT_COLUMNS = ("pr.id as 'Print Number',"
+                     "pr.partiture as Partiture,"
+                     "s.name as Title,"
+                     "s.genre as Genre,"
+                     "s.key as Key,"
+                     "s.incipit as Incipit,"
+                     "s.year as 'Composition Year',"
+                     "e.name as 'Edition',"
+                     "s.id as score_id,"
+                     "e.id as edition_id ")
+
+
+def fill_prints(cursor, prints):
+  """
+  This function adds voices, composers and editors to fetched prints
 
-  sql_voices = ("select name, range "
+  They are fetched by one query each, regardless of the number of prints.
+  """
+  sql_voices = ("select score as group_id, name, range "
                 "from voice "
-                "where score = ? "
-                "order by number")
+                "where score in ({}) "
+                "order by score, number")
 
-  sql_composer = ("select p.name, p.born, p.died "
-                 "from person p "
-                 "join score_author s on p.id = s.composer "
-                 "where s.score = ?")
+  sql_composer = ("select s.score as group_id, p.name, p.born, p.died "
+                  "from person p "
+                  "join score_author s on p.id = s.composer "
+                  "where s.score in ({}) "
+                  "order by s.score, s.id")
 
-  sql_editor = ("select p.name, p.born, p.died "
+  sql_editor = ("select e.edition as group_id, p.name, p.born, p.died "
                 "from person p "
                 "join edition_author e on p.id = e.editor "
-                "where e.edition = ?")
+                "where e.edition in ({}) "
+                "order by e.edition, e.id")
 
-  cursor.execute(sql, (composer_id,))
-  prints = [dict_from_row(row) for row in cursor.fetchall()]
+  score_ids = list({p["score_id"] for p in prints})
+  edition_ids = list({p["edition_id"] for p in prints})
+
+  voices = fetch_grouped(cursor, sql_voices, score_ids)
+  composers = fetch_grouped(cursor, sql_composer, score_ids)
+  editors = fetch_grouped(cursor, sql_editor, edition_ids)
 
   for p in prints:
     for k in p.keys():
@@ -99,38 +213,201 @@ def get_print_by_composer(cursor, composer_id):
         p[k] = None
 
     p["Partiture"] = p["Partiture"] == "Y"
+    p["Voices"] = voices.get(p["score_id"], [])
+    p["Composer"] = composers.get(p["score_id"], [])
+    p["Editor"] = editors.get(p.pop("edition_id"), [])
+    del p["score_id"]
 
-    cursor.execute(sql_voices, (p["score_id"],))
-    p["Voices"] = [dict_from_row(row) for row in cursor.fetchall()]
 
-    cursor.execute(sql_composer, (p["score_id"],))
-    p["Composer"] = [dict_from_row(row) for row in cursor.fetchall()]
+SQL_PRINTS_BY_COMPOSERS = ("select sa.composer as group_id," +
+                           SQL_PRINT_COLUMNS +
+                           "from print pr "
+                           "join edition e on pr.edition = e.id "
+                           "join score s on e.score = s.id "
+                           "join score_author sa on sa.score = s.id "
+                           "where sa.composer in ({}) "
+                           "order by sa.composer, pr.id")
 
-    cursor.execute(sql_editor, (p["edition_id"],))
-    p["Editor"] = [dict_from_row(row) for row in cursor.fetchall()]
 
-    del p["score_id"]
-    del p["edition_id"]
+def get_prints_by_composers(cursor, composer_ids):
+  """
+  Return lists of Prints where composers participate
+
+  Prints of all composers and their voices, composers and editors are
+  fetched by one query each, regardless of the number of prints.
+
+  Returns:
+    dict of lists of prints by composer id
+  """
+  prints = fetch_grouped(cursor, SQL_PRINTS_BY_COMPOSERS, list(composer_ids))
+  fill_prints(cursor, [p for lst in prints.values() for p in lst])
+
+  return {composer_id: prints.get(composer_id, [])
+          for composer_id in composer_ids}
+
+
+def iter_prints_by_composer(cursor, composer_id):
+  """
+  This generator yields Prints where composer participates
 
+  Prints are read from cursor and completed in batches of PRINT_BATCH,
+  so only one batch is held in memory.
+  """
+  cursor.execute(SQL_PRINTS_BY_COMPOSERS.format("?"), (composer_id,))
+  fill_cursor = cursor.connection.cursor()
+  while True:
+    batch = [dict_from_row(row) for row in cursor.fetchmany(PRINT_BATCH)]
+    if not batch:
+      break
+    for p in batch:
+      del p["group_id"]
+    fill_prints(fill_cursor, batch)
+    yield from batch
+
+
+def get_prints_by_scores(cursor, score_ids):
+  """
+  Return Prints of given scores, in order of score ids
+
+  Returns:
+    list of prints
+  """
+  sql = ("select s.id as group_id," + SQL_PRINT_COLUMNS +
+         "from print pr "
+         "join edition e on pr.edition = e.id "
+         "join score s on e.score = s.id "
+         "where s.id in ({}) "
+         "order by s.id, pr.id")
+
+  prints = fetch_grouped(cursor, sql, list(score_ids))
+  found = [p for score_id in score_ids for p in prints.get(score_id, [])]
+  fill_prints(cursor, found)
+
+  return found
+
+
+def get_print_by_composer(cursor, composer_id):
+  """Return list of Prints where composer participates"""
+  return get_prints_by_composers(cursor, [composer_id])[composer_id]
+
+
+def search(cursor, composer, prefix=False):
+  """
+  This function finds Prints of all composers matching name
+
+  Returns:
+    dict of lists of prints by composer name
+  """
+  composer_list = get_composers_id(cursor, composer, prefix)
+  by_id = get_prints_by_composers(cursor, [c["id"] for c in composer_list])
+
+  prints = {}
+  for c in composer_list:
+    prints[c["name"]] = by_id[c["id"]]
   return prints
 
 
-#script body
-DB_FILE = "./scorelib.dat"
+def search_titles(cursor, title):
+  """
+  This function finds Prints of scores whose title or incipit matches text
+
+  Returns:
+    list of prints ordered by relevance of their score
+  """
+  return get_prints_by_scores(cursor, get_scores_id(cursor, title))
 
-#parse arguments
-composer = parse_args()
 
-con = sqlite3.connect(DB_FILE)
-con.row_factory = sqlite3.Row
-cur = con.cursor()
+def iter_search(cursor, composer, prefix=False):
+  """
+  This generator yields Prints of composers matching name as they are read
+
+  Yields: composer name and generator of its prints
+  """
+  for c in get_composers_id(cursor, composer, prefix):
+    yield c["name"], iter_prints_by_composer(cursor, c["id"])
 
-prints = {}
-#get id of composers matching given name substring
-composer_list = get_composers_id(cur, composer)
-for c in composer_list:
-  prints[c["name"]] = get_print_by_composer(cur, c["id"])
 
-con.close()
+def iter_search_titles(cursor, title):
+  """
+  This generator yields Prints of scores matching text as they are read
+
+  Prints are fetched for IN_CHUNK scores at once, in order of relevance.
+  """
+  for score_ids in chunked(get_scores_id(cursor, title)):
+    yield from get_prints_by_scores(cursor, score_ids)
+
+
+def write_json_list(items, stream, indent=""):
+  """
+  This function writes list as json.dumps(indent=2) does, item by item
+
+  Parameters:
+    items (iterable): JSON serializable items, consumed as they are written
+    stream (file): text stream
+    indent (str): indentation of the line the list starts on
+  """
+  empty = True
+  for item in items:
+    stream.write("[\n" if empty else ",\n")
+    empty = False
+    text = json.dumps(item, indent=2, ensure_ascii=False)
+    stream.write(indent + "  " + text.replace("\n", "\n" + indent + "  "))
+  stream.write("[]" if empty else "\n" + indent + "]")
+
+
+def write_json_groups(groups, stream):
+  """
+  This function writes dict of lists as json.dumps(indent=2) does
+
+  Parameters:
+    groups (iterable): pairs of key and items, consumed as they are written
+    stream (file): text stream
+  """
+  empty = True
+  for key, items in groups:
+    stream.write("{\n" if empty else ",\n")
+    empty = False
+    stream.write("  " + json.dumps(key, ensure_ascii=False) + ": ")
+    write_json_list(items, stream, "  ")
+  stream.write("{}" if empty else "\n}")
+
+
+def write_json_lines(items, stream):
+  "This function writes each item as JSON on a line of its own"
+  for item in items:
+    stream.write(json.dumps(item, ensure_ascii=False))
+    stream.write("\n")
+
+
+def composer_lines(groups):
+  "This generator joins prints with name of composer they were found by"
+  for name, prints in groups:
+    for p in prints:
+      yield {"composer": name, "print": p}
+
+
+#script body
+DB_FILE = "./scorelib.dat"
 
-print(json.dumps(prints, indent=2, ensure_ascii=False))
+if __name__ == "__main__":
+  #parse arguments
+  text, titles, lines, prefix = parse_args()
+
+  con = sqlite3.connect(DB_FILE)
+  con.row_factory = sqlite3.Row
+  cur = con.cursor()
+
+  #prints are written as they are fetched, result is never held in memory
+  if titles and lines:
+    write_json_lines(iter_search_titles(cur, text), sys.stdout)
+  elif titles:
+    write_json_list(iter_search_titles(cur, text), sys.stdout)
+    print()
+  elif lines:
+    write_json_lines(composer_lines(iter_search(cur, text, prefix)),
+                     sys.stdout)
+  else:
+    write_json_groups(iter_search(cur, text, prefix), sys.stdout)
+    print()
+
+  con.close()
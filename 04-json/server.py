@@ -0,0 +1,326 @@
+#! python3
+
+"""
+This script serves getprint and search lookups over HTTP
+Database is opened once, lookups share pool of read-only connections
+Serialized results are cached until database file changes
+Endpoints (results are JSON structures of the same content as the scripts):
+  GET /getprint/<print id>
+  GET /search/<composer>
+  GET /search/<composer>?prefix
+  GET /search/<title>?title
+"""
+import os
+import sys
+import time
+import argparse
+import sqlite3
+import json
+import queue
+import threading
+import contextlib
+import collections
+from os import path
+from urllib.parse import urlsplit, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from getprint import get_print_authors, strip_authors
+from search import search, search_titles, DB_FILE
+
+#compiled statements kept by each connection, search builds IN lists of
+#different lengths so each length is a statement of its own
+STATEMENT_CACHE = 256
+
+#journal files of database, they are written by import before database itself
+DB_JOURNALS = ("-wal", "-journal")
+
+
+def eprint(*args, **kwargs):
+  "This function prints message to error output"
+  print(*args, file=sys.stderr, **kwargs)
+
+
+def parse_args():
+  "This function parses command-line arguments and does basic checks"
+  parser = argparse.ArgumentParser()
+  parser.add_argument("-d", "--database", default=DB_FILE,
+                      help="SQLite database file")
+  parser.add_argument("-H", "--host", default="127.0.0.1",
+                      help="address to listen on")
+  parser.add_argument("-P", "--port", type=int, default=8080,
+                      help="port to listen on")
+  parser.add_argument("-c", "--connections", type=int, default=4,
+                      help="number of pooled database connections")
+  parser.add_argument("-C", "--cache-size", type=int, default=1024,
+                      help="number of cached results, 0 disables cache")
+  parser.add_argument("-t", "--cache-ttl", type=float, default=300,
+                      help="seconds a cached result is valid")
+  parser.add_argument("-v", "--verbose", action="store_true",
+                      help="log every request to error output")
+
+  args = parser.parse_args()
+
+  if not path.isfile(args.database):
+    eprint("Database file doesn't exist")
+    exit(2)
+
+  if args.connections < 1:
+    eprint("Number of connections has to be positive")
+    exit(2)
+
+  if args.cache_size < 0 or args.cache_ttl <= 0:
+    eprint("Cache size can't be negative and time to live has to be positive")
+    exit(2)
+
+  return (args.database, args.host, args.port, args.connections,
+          args.cache_size, args.cache_ttl, args.verbose)
+
+
+def db_generation(database):
+  """
+  This function identifies current content of database file
+
+  Any committed change rewrites database or its journal, so modification
+  time and size of these files change. Full import replaces database by a
+  new file, so its inode changes.
+
+  Returns: tuple of inodes, devices, modification times and sizes
+  """
+  generation = []
+  for name in (database,) + tuple(database + ext for ext in DB_JOURNALS):
+    try:
+      stat = os.stat(name)
+    except OSError:
+      generation.append(None)
+    else:
+      generation.append((stat.st_ino, stat.st_dev, stat.st_mtime_ns,
+                         stat.st_size))
+  return tuple(generation)
+
+
+def db_identity(generation):
+  "This function returns inode and device of database file of generation"
+  return generation[0][:2] if generation[0] is not None else None
+
+
+class ConnectionPool:
+  """
+  Pool of read-only connections shared by request threads
+
+  Connections stay open on the file they were opened on, so when database
+  file is replaced they are reopened before they are lent again.
+
+  Parameters:
+    database (str): SQLite database file
+    size (int): number of connections, requests over it wait for a free one
+  """
+  __slots__ = ("free", "uri", "identity", "epoch")
+
+  def __init__(self, database, size):
+    self.free = queue.Queue()
+    self.uri = "file:{}?mode=ro".format(path.abspath(database))
+    self.identity = db_identity(db_generation(database))
+    self.epoch = 0
+    for _ in range(size):
+      self.free.put((self.connect(), self.epoch))
+
+  def connect(self):
+    "This method opens new read-only connection"
+    con = sqlite3.connect(self.uri, uri=True, check_same_thread=False,
+                          cached_statements=STATEMENT_CACHE)
+    con.row_factory = sqlite3.Row
+    return con
+
+  def refresh(self, identity):
+    """
+    This method makes connections reopen if database file has been replaced
+
+    Connections opened before are closed when they are lent next time.
+    """
+    if identity != self.identity:
+      self.identity = identity
+      self.epoch += 1
+
+  @contextlib.contextmanager
+  def cursor(self):
+    "This method lends cursor of a free connection for one lookup"
+    con, epoch = self.free.get()
+    if epoch != self.epoch:
+      epoch = self.epoch
+      con.close()
+      try:
+        con = self.connect()
+      except sqlite3.Error:
+        #closed connection is replaced again by the next lend
+        self.free.put((con, -1))
+        raise
+    try:
+      yield con.cursor()
+    finally:
+      con.rollback()
+      self.free.put((con, epoch))
+
+  def close(self):
+    "This method closes all connections, they have to be returned first"
+    while not self.free.empty():
+      self.free.get()[0].close()
+
+
+class ResultCache:
+  """
+  LRU cache of serialized results valid for one generation of database
+
+  Parameters:
+    database (str): SQLite database file
+    size (int): maximal number of results, least recently used are dropped
+    ttl (float): seconds a result is valid even if database does not change
+    pool (ConnectionPool): connections refreshed when database file changes
+  """
+  __slots__ = ("database", "size", "ttl", "pool", "results", "generation",
+               "lock", "hits", "misses")
+
+  def __init__(self, database, size, ttl, pool):
+    self.database = database
+    self.pool = pool
+    self.size = size
+    self.ttl = ttl
+    self.results = collections.OrderedDict()
+    self.generation = None
+    self.lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, key):
+    """
+    This method returns cached result of lookup key
+
+    All results are dropped when database has changed since they were stored,
+    connections of pool are reopened if database file has been replaced.
+
+    Returns: serialized result (None if it isn't cached), generation of
+    database the result has to be computed on
+    """
+    generation = db_generation(self.database)
+    with self.lock:
+      if generation != self.generation:
+        self.results.clear()
+        self.generation = generation
+        self.pool.refresh(db_identity(generation))
+      entry = self.results.get(key)
+      if entry is None or entry[0] < time.monotonic():
+        self.misses += 1
+        return None, generation
+      self.results.move_to_end(key)
+      self.hits += 1
+      return entry[1], generation
+
+  def put(self, key, body, generation):
+    "This method stores result computed on given generation of database"
+    if self.size == 0:
+      return
+    with self.lock:
+      if generation != self.generation:
+        return
+      self.results[key] = (time.monotonic() + self.ttl, body)
+      self.results.move_to_end(key)
+      while len(self.results) > self.size:
+        self.results.popitem(last=False)
+
+
+def lookup_getprint(cursor, print_id, query):
+  "This function returns composers of print, see getprint.py"
+  return strip_authors(get_print_authors(cursor, int(print_id)))
+
+
+def lookup_search(cursor, text, query):
+  "This function returns prints of composers or titles, see search.py"
+  options = query.split("&")
+  if "title" in options:
+    return search_titles(cursor, text)
+  return search(cursor, text, "prefix" in options)
+
+
+ROUTES = {
+  "getprint": lookup_getprint,
+  "search": lookup_search,
+}
+
+
+class LookupHandler(BaseHTTPRequestHandler):
+  "Handler of lookup requests, connections are kept alive between requests"
+  protocol_version = "HTTP/1.1"
+  #headers and body are written separately, small responses would otherwise
+  #wait for delayed acknowledgement of the headers
+  disable_nagle_algorithm = True
+
+  def do_GET(self):
+    url = urlsplit(self.path)
+    route, _, arg = url.path.strip("/").partition("/")
+    lookup = ROUTES.get(route)
+    if lookup is None or not arg:
+      self.send_json(404, {"error": "Unknown lookup"})
+      return
+
+    cache = self.server.cache
+    key = (route, unquote(arg), url.query)
+    body, generation = cache.get(key)
+    if body is None:
+      try:
+        with self.server.pool.cursor() as cursor:
+          result = lookup(cursor, *key[1:])
+      except ValueError as ve:
+        self.send_json(400, {"error": str(ve)})
+        return
+      except sqlite3.Error as se:
+        self.send_json(500, {"error": str(se)})
+        return
+      body = json.dumps(result, ensure_ascii=False).encode("utf-8")
+      cache.put(key, body, generation)
+
+    self.send_body(200, body)
+
+  def send_json(self, status, content):
+    "This method sends content serialized to JSON as the response"
+    body = json.dumps(content, ensure_ascii=False).encode("utf-8")
+    self.send_body(status, body)
+
+  def send_body(self, status, body):
+    "This method sends serialized JSON as the response"
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json; charset=utf-8")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):
+    if self.server.verbose:
+      super().log_message(format, *args)
+
+
+def make_server(database, host, port, connections, cache_size=0,
+                cache_ttl=300, verbose=False):
+  """
+  This function creates lookup server, it is started by serve_forever()
+
+  Returns: ThreadingHTTPServer with connection pool
+  """
+  server = ThreadingHTTPServer((host, port), LookupHandler)
+  server.daemon_threads = True
+  server.pool = ConnectionPool(database, connections)
+  server.cache = ResultCache(database, cache_size, cache_ttl, server.pool)
+  server.verbose = verbose
+  return server
+
+
+#script body
+if __name__ == "__main__":
+  DB, HOST, PORT, CONNECTIONS, CACHE_SIZE, CACHE_TTL, VERBOSE = parse_args()
+
+  SERVER = make_server(DB, HOST, PORT, CONNECTIONS, CACHE_SIZE, CACHE_TTL,
+                       VERBOSE)
+  eprint("Serving {} on http://{}:{}/".format(DB, *SERVER.server_address))
+  try:
+    SERVER.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  SERVER.server_close()
+  SERVER.pool.close()
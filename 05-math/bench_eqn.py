@@ -0,0 +1,68 @@
+#! python3
+
+"""
+This script compares time and memory of dense and sparse solving of eqn.py
+on generated systems of given sizes
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+
+def eprint(*args, **kwargs):
+  "This function prints message to error output"
+  print(*args, file=sys.stderr, **kwargs)
+
+
+def parse_args():
+  "This function parses command-line arguments and does basic checks"
+  parser = argparse.ArgumentParser()
+  parser.add_argument("sizes", type=int, nargs="*", default=[1000, 10000, 100000],
+                      help="Numbers of variables of generated systems")
+  parser.add_argument("-d", "--dense-limit", type=int, default=5000,
+                      help="Largest system solved densely, dense matrix of n "
+                      "variables takes 8*n*n bytes")
+  parser.add_argument("-b", "--band", type=int, default=20,
+                      help="Band of generated systems, see gen_system.py")
+
+  args = parser.parse_args()
+
+  return args.sizes, args.dense_limit, args.band
+
+
+def run(args):
+  """
+  This function runs script in child process
+
+  Returns: seconds elapsed, maximal resident memory in MB
+  """
+  start = time.perf_counter()
+  proc = subprocess.Popen([sys.executable] + args, stdout=subprocess.DEVNULL)
+  _, status, usage = os.wait4(proc.pid, 0)
+  elapsed = time.perf_counter() - start
+  proc.returncode = os.waitstatus_to_exitcode(status)
+  if proc.returncode:
+    eprint("{} failed with exit code {}".format(" ".join(args), proc.returncode))
+  return elapsed, usage.ru_maxrss / 1024
+
+
+#script body
+SIZES, DENSE_LIMIT, BAND = parse_args()
+
+print("{:>8} {:>8} {:>10} {:>10}".format("size", "mode", "time [s]", "RSS [MB]"))
+with tempfile.TemporaryDirectory() as TMP:
+  for SIZE in SIZES:
+    SYSTEM = os.path.join(TMP, "system{}.txt".format(SIZE))
+    with open(SYSTEM, "w") as FILE:
+      subprocess.run([sys.executable, "gen_system.py", str(SIZE),
+                      "-b", str(BAND)], stdout=FILE, check=True)
+
+    for MODE in ("dense", "sparse"):
+      if MODE == "dense" and SIZE > DENSE_LIMIT:
+        print("{:>8} {:>8} {:>10} {:>10}".format(SIZE, MODE, "skipped", "-"))
+        continue
+      ELAPSED, RSS = run(["eqn.py", "-m", MODE, SYSTEM])
+      print("{:>8} {:>8} {:>10.2f} {:>10.0f}".format(SIZE, MODE, ELAPSED, RSS))
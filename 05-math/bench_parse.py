@@ -0,0 +1,66 @@
+#! python3
+
+"""
+This script measures parsing throughput of equation lines on generated file
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+import eqn
+
+
+def eprint(*args, **kwargs):
+  "This function prints message to error output"
+  print(*args, file=sys.stderr, **kwargs)
+
+
+def parse_args():
+  "This function parses command-line arguments and does basic checks"
+  parser = argparse.ArgumentParser()
+  parser.add_argument("-n", "--equations", type=int, default=1000000,
+                      help="Number of generated equations")
+  parser.add_argument("-V", "--variables", type=int, default=10000,
+                      help="Number of variables of generated system")
+
+  args = parser.parse_args()
+
+  if args.equations < 1 or args.variables < 1:
+    eprint("Number of equations and variables has to be positive")
+    exit(2)
+
+  return args.equations, args.variables
+
+
+def bench(func, lines):
+  """
+  This function calls func with all lines
+
+  Returns: number of lines per second
+  """
+  start = time.perf_counter()
+  func(lines)
+  return len(lines) / (time.perf_counter() - start)
+
+
+def parse_lines(lines):
+  "This function parses each line separately"
+  for line in lines:
+    eqn.parse_equation(line)
+
+
+#script body
+EQUATIONS, VARIABLES = parse_args()
+
+with tempfile.TemporaryDirectory() as TMP:
+  SYSTEM = os.path.join(TMP, "system.txt")
+  with open(SYSTEM, "w") as FILE:
+    subprocess.run([sys.executable, "gen_system.py", str(VARIABLES), "-e",
+                    str(EQUATIONS), "-b", "20"], stdout=FILE, check=True)
+  with open(SYSTEM, "r", encoding="utf-8") as FILE:
+    LINES = FILE.readlines()
+
+print("parse_equation: {:.0f} lines/s".format(bench(parse_lines, LINES)))
+print("read_system: {:.0f} lines/s".format(bench(eqn.read_system, LINES)))
@@ -5,9 +5,41 @@ This script solves equations given in human readable file
 """
 import sys
 import os
-import re
+import json
 import argparse
+import multiprocessing
+from array import array
 import numpy as np
+try:
+  from scipy.linalg import qr as pivoted_qr, solve_triangular
+  from scipy.sparse import csr_matrix
+  from scipy.sparse.linalg import splu, norm as sparse_norm
+except ImportError:
+  pivoted_qr = None
+  csr_matrix = None
+
+#residual of constants is computed by two matrix products, its rounding error
+#is allowed to be this multiple of tolerance of np.linalg.matrix_rank
+RESIDUAL_ROUNDING = 10
+
+#characters of coefficients and constants, and of variable names
+NUMBER_CHARS = "0123456789."
+VARIABLE_CHARS = "abcdefghijklmnopqrstuvwxyz"
+
+#number of systems of batch sent to worker process at once
+BATCH_CHUNK = 16
+
+#verbose mode, set by command-line argument
+VERBOSE = False
+
+#systems with at least this number of variables and at most this fraction of
+#nonzero coefficients are solved as sparse, if scipy is available
+SPARSE_MIN_SIZE = 200
+SPARSE_DENSITY = 0.01
+
+#sparse systems which aren't of full rank are solved densely only up to this
+#number of matrix entries (200 MB), larger ones are refused
+DENSE_MAX_SIZE = 25000000
 
 
 def eprint(*args, **kwargs):
@@ -24,98 +56,452 @@ def verbose_print(*args, **kwargs):
 def parse_args():
   "This function parses command-line arguments and does basic checks"
   parser = argparse.ArgumentParser()
-  parser.add_argument("filename", help="File with system of equations to solve")
+  parser.add_argument("filename",
+                      help="File with system of equations to solve, in batch "
+                      "mode a directory of such files or a file with systems "
+                      "separated by empty lines")
   parser.add_argument("-v", action='store_true', help="Activation of verbose mode")
+  parser.add_argument("-m", "--mode", choices=("auto", "dense", "sparse"),
+                      default="auto",
+                      help="Storage of coefficient matrix, auto selects it by density")
+  parser.add_argument("-b", "--batch", action='store_true',
+                      help="Solve many systems, results are written as JSON Lines")
+  parser.add_argument("-j", "--jobs", type=int, default=1,
+                      help="Number of worker processes in batch mode")
 
   args = parser.parse_args()
 
-  if not os.path.isfile(args.filename):
+  if args.batch and os.path.isdir(args.filename):
+    pass
+  elif not os.path.isfile(args.filename):
     eprint("Filename doesn't refer to a valid file")
     exit(2)
 
-  return args.filename, args.v
+  if args.jobs < 1:
+    eprint("Number of jobs has to be positive")
+    exit(2)
+
+  if args.mode == "sparse" and csr_matrix is None:
+    eprint("Sparse mode requires scipy")
+    exit(2)
+
+  return args.filename, args.v, args.mode, args.batch, args.jobs
+
+
+def parse_number(token):
+  "This function converts number token to int, or to float if it has a point"
+  return int(token) if token.isdigit() else float(token)
 
 
 def parse_equation(line):
   """
   This function parses string of humad-readable equation
 
-  Returns: record with variables and theirs coeficients(dict), constant(int)
+  Line is scanned by string methods only: it is split at = to sides and
+  sides at signs to terms. Both sides may contain variables and constants,
+  with optional sign and decimal point. Variables are moved to the left side
+  and constants to the right side, terms of the same variable are summed.
+
+  Returns: record with variables and theirs coeficients(dict), constant(int
+  or float)
   """
-  eqn = {}
+  left, equals, right = line.partition("=")
+  if not equals or "=" in right:
+    raise ValueError("Equation not well formated")
 
-  rgx_left = re.compile(r"(?P<sign>[+-])?\s*(?P<coef>\d*)(?P<var>[a-z]+)\s*")
+  eqn = {}
+  constant = 0
+  for side, text in ((1, left), (-1, right)):
+    terms = text.replace("-", "+-").split("+")
+    #side may start with sign
+    if len(terms) > 1 and not terms[0].strip():
+      del terms[0]
 
-  left = [f.groupdict() for f in rgx_left.finditer(line)]
-  right = re.findall(r"[=]\s*(\d+)", line)
+    for term in terms:
+      term = term.strip()
+      sign = side
+      if term[:1] == "-":
+        sign = -side
+        term = term[1:].lstrip()
 
-  for term in left:
-    term["coef"] = int(term["coef"]) if term["coef"] != '' else 1
-    if term["sign"] == '-':
-      term["coef"] = -term["coef"]
-    eqn[term["var"]] = term["coef"]
+      #coefficient has to be written right before variable
+      var = term.lstrip(NUMBER_CHARS)
+      if var:
+        if var.strip(VARIABLE_CHARS):
+          raise ValueError("Equation not well formated")
+        coef = term[:len(term) - len(var)]
+        eqn[var] = eqn.get(var, 0) + sign * (parse_number(coef) if coef else 1)
+      elif term:
+        constant -= sign * parse_number(term)
+      else:
+        raise ValueError("Equation not well formated")
 
-  if eqn and len(right) == 1:
-    return eqn, int(right[0])
+  if eqn:
+    return eqn, constant
   else:
     raise ValueError("Equation not well formated")
 
 
-FILENAME, VERBOSE = parse_args()
+def read_system(lines):
+  """
+  This function parses equations to system in coordinate (COO) format
+
+  Each coefficient is stored as triplet (row, variable index, coefficient).
+  Triplets and constants are appended to typed arrays, which grow in place
+  and are passed to numpy without copying.
 
-#dict with index of all appeared variables
-variables = {}
-#list of all equations
-equations = []
-#list of all constants
-constants = np.array([])
+  Returns: dict with index of all appeared variables, arrays of rows,
+  variable indexes and coefficients of triplets, array of constants
+  """
+  variables = {}
+  rows = array('l')
+  cols = array('l')
+  coefs = array('d')
+  constants = array('d')
 
-with open(FILENAME, 'r', encoding='utf-8') as FILE:
-  for line in FILE:
+  for line in lines:
     try:
       eqn, cnst = parse_equation(line.strip())
-      for e in eqn.keys():
-        if e not in variables:
-          variables[e] = len(variables)
     except ValueError as ve:
       eprint("Given equation <{}> failed with error: {}".format(line.strip(), ve))
       continue
 
-    equations.append(eqn)
-    constants = np.append(constants, cnst)
-
-#filling matrix with coeficients
-matrix = np.zeros((len(equations), len(variables)))
-for idx, eqn in enumerate(equations):
-  for var, coef in eqn.items():
-    matrix[idx][variables[var]] = coef
-
-for idx, e in enumerate(equations):
-  verbose_print(e, constants[idx])
-verbose_print(*variables.keys())
-verbose_print(matrix)
-
-#creating augmented matrix
-augm_matrix = np.array(np.column_stack((matrix, constants)))
-verbose_print(augm_matrix)
-
-#calculating rank of matrixes
-rank_coef = np.linalg.matrix_rank(matrix)
-verbose_print("Rank matrix: " + str(rank_coef))
-rank_augm = np.linalg.matrix_rank(augm_matrix)
-verbose_print("Rank augmented matrix: " + str(rank_augm))
-
-#equation has a solution
-if rank_augm <= rank_coef:
-  #equation has a sinle solution
-  if rank_augm == len(variables):
-    solution = np.linalg.solve(matrix, constants)
-    verbose_print("Numpy solution: ", solution)
-    singles = ["{} = {}".format(var, solution[variables[var]])
-               for var in sorted(variables.keys())]
-    print("solution: {}".format(", ".join(singles)))
+    verbose_print(eqn, cnst)
+    row = len(constants)
+    for var, coef in eqn.items():
+      rows.append(row)
+      cols.append(variables.setdefault(var, len(variables)))
+      coefs.append(coef)
+    constants.append(cnst)
+
+  return (variables, np.frombuffer(rows, dtype=rows.typecode),
+          np.frombuffer(cols, dtype=cols.typecode),
+          np.frombuffer(coefs, dtype=coefs.typecode),
+          np.frombuffer(constants, dtype=constants.typecode))
+
+
+class DenseSolver:
+  """
+  Factorization of dense coefficient matrix, reused for any constants
+
+  Matrix is factorized once, by QR with column pivoting (or by SVD without
+  scipy). Rank is the number of diagonal entries of R (singular values) over
+  tolerance of np.linalg.matrix_rank. Augmented matrix has higher rank if
+  constants don't lie in the span of the first rank columns of Q (U).
+
+  Parameters:
+    matrix (ndarray): coefficient matrix
+  """
+  __slots__ = ("matrix", "basis", "factor", "magnitudes", "permutation",
+               "rank")
+
+  def __init__(self, matrix):
+    self.matrix = matrix
+    self.permutation = None
+    if matrix.size == 0:
+      self.basis = np.empty((matrix.shape[0], 0))
+      self.magnitudes = np.zeros(1)
+      self.factor = np.empty((0, 0))
+    elif pivoted_qr is not None:
+      self.basis, self.factor, self.permutation = pivoted_qr(
+        matrix, mode='economic', pivoting=True)
+      self.magnitudes = np.abs(np.diagonal(self.factor))
+    else:
+      self.basis, self.magnitudes, self.factor = np.linalg.svd(
+        matrix, full_matrices=False)
+
+    #calculating rank of matrix
+    tolerance = (self.magnitudes.max() * max(matrix.shape) *
+                 np.finfo(matrix.dtype).eps)
+    self.rank = int(np.count_nonzero(self.magnitudes > tolerance))
+    self.basis = self.basis[:, :self.rank]
+    verbose_print("Rank matrix: " + str(self.rank))
+
+  def solve_factorized(self, coords):
+    "This method returns x of A x = b from Q^T b (U^T b)"
+    if self.permutation is None:
+      return self.factor.T @ (coords / self.magnitudes)
+    unpermuted = np.empty(self.matrix.shape[1])
+    unpermuted[self.permutation] = solve_triangular(self.factor, coords)
+    return unpermuted
+
+  def solve(self, constants):
+    """
+    This method solves system with given constants
+
+    Returns: rank of coefficient matrix, rank of augmented matrix,
+    solution (array) if it is single, None otherwise
+    """
+    rows, size = self.matrix.shape
+    coords = self.basis.T @ constants
+    residual = np.linalg.norm(constants - self.basis @ coords)
+    tolerance = (max(self.magnitudes.max(), np.linalg.norm(constants)) *
+                 max(rows, size + 1) * np.finfo(self.matrix.dtype).eps *
+                 RESIDUAL_ROUNDING)
+    rank_augm = self.rank + int(residual > tolerance)
+    verbose_print("Rank augmented matrix: " + str(rank_augm))
+
+    solution = None
+    if rank_augm == self.rank == size:
+      solution = self.solve_factorized(coords)
+      #one step of iterative refinement with the same factorization
+      solution += self.solve_factorized(
+        self.basis.T @ (constants - self.matrix @ solution))
+      verbose_print("Numpy solution: ", solution)
+
+    return self.rank, rank_augm, solution
+
+
+class SparseSolver:
+  """
+  Sparse LU factorization of sparse (CSR) coefficient matrix
+
+  Square matrix is factorized directly. Rectangular matrix is solved by
+  normal equations, A^T A of overdetermined or A A^T of underdetermined
+  system is factorized. Full rank is estimated by magnitude of pivots, with
+  tolerance of np.linalg.matrix_rank. If matrix isn't of full rank, factor
+  is None and rank has to be computed densely.
+
+  Parameters:
+    matrix (csr_matrix): coefficient matrix
+  """
+  __slots__ = ("matrix", "factor", "rank", "norm")
+
+  def __init__(self, matrix):
+    rows, size = matrix.shape
+    self.matrix = matrix
+    self.factor = None
+    self.rank = min(rows, size)
+    self.norm = sparse_norm(matrix)
+    if self.rank == 0:
+      return
+    if rows > size:
+      normal = matrix.T @ matrix
+    elif rows < size:
+      normal = matrix @ matrix.T
+    else:
+      normal = matrix
+
+    try:
+      factor = splu(normal.tocsc())
+    except RuntimeError as rte:
+      verbose_print("Sparse factorization failed: {}".format(rte))
+      return
+
+    pivots = np.abs(factor.U.diagonal())
+    if pivots.min() <= pivots.max() * self.rank * np.finfo(pivots.dtype).eps:
+      verbose_print("Sparse factorization is numerically singular")
+      return
+    self.factor = factor
+
+  def solve(self, constants):
+    "This method solves system with given constants, see DenseSolver.solve"
+    rows, size = self.matrix.shape
+    #rows are independent, so any constants lie in the column space
+    if rows < size:
+      return self.rank, self.rank, None
+
+    if rows == size:
+      solution = self.factor.solve(constants)
+      verbose_print("Sparse solution: ", solution)
+      return self.rank, self.rank, solution
+
+    #least squares solution with one step of iterative refinement, it solves
+    #the system if constants lie in the column space
+    solution = self.factor.solve(self.matrix.T @ constants)
+    solution += self.factor.solve(
+      self.matrix.T @ (constants - self.matrix @ solution))
+    residual = np.linalg.norm(constants - self.matrix @ solution)
+    tolerance = (max(self.norm, np.linalg.norm(constants)) * (rows + 1) *
+                 np.finfo(solution.dtype).eps * RESIDUAL_ROUNDING)
+    if residual > tolerance:
+      verbose_print("Sparse residual: ", residual)
+      return self.rank, self.rank + 1, None
+    verbose_print("Sparse solution: ", solution)
+    return self.rank, self.rank, solution
+
+
+def use_sparse(mode, shape, nonzeros):
+  "This function decides whether system is solved as sparse"
+  if mode == "auto":
+    return (csr_matrix is not None and shape[1] >= SPARSE_MIN_SIZE and
+            nonzeros <= SPARSE_DENSITY * shape[0] * shape[1])
+  return mode == "sparse"
+
+
+def make_solver(mode, shape, rows, cols, coefs):
+  """
+  This function factorizes coefficient matrix given by COO triplets
+
+  Returns: SparseSolver if matrix is sparse and of full rank, DenseSolver
+  otherwise
+
+  Raises: ValueError if sparse matrix isn't of full rank and it is too large
+  to be stored densely
+  """
+  if use_sparse(mode, shape, len(coefs)):
+    verbose_print("Solving sparse system")
+    solver = SparseSolver(csr_matrix((coefs, (rows, cols)), shape=shape))
+    if solver.factor is not None:
+      return solver
+    if shape[0] * shape[1] > DENSE_MAX_SIZE:
+      raise ValueError("Sparse matrix {}x{} is not of full rank and it is too "
+                       "large to be solved densely".format(*shape))
+    if mode == "sparse":
+      eprint("Sparse matrix is not of full rank, it is solved densely")
+
+  #filling matrix with coeficients in one step, each variable appears in
+  #equation at most once so triplets never share position
+  matrix = np.zeros(shape)
+  matrix[rows, cols] = coefs
+  verbose_print(matrix)
+  return DenseSolver(matrix)
+
+
+def print_result(variables, rank_coef, rank_augm, solution):
+  "This function prints solution or its absence in human readable form"
+  #equation has a solution
+  if rank_augm <= rank_coef:
+    #equation has a sinle solution
+    if solution is not None:
+      singles = ["{} = {}".format(var, solution[variables[var]])
+                 for var in sorted(variables.keys())]
+      print("solution: {}".format(", ".join(singles)))
+    else:
+      print("solution space dimension: " + str(len(variables) - rank_coef))
+  #equation has no solution
   else:
-    print("solution space dimension: " + str(len(variables) - rank_coef))
-#equation has no solution
-else:
-  print("no solution")
+    print("no solution")
+
+
+def result_record(name, variables, rank_coef, rank_augm, solution):
+  """
+  This function converts result of system to JSON serializable record
+
+  Returns: dict with name of system and its result, which is "single" with
+  solution, "infinite" with dimension of solution space or "none"
+  """
+  if rank_augm > rank_coef:
+    return {"system": name, "result": "none"}
+  if solution is None:
+    return {"system": name, "result": "infinite",
+            "dimension": len(variables) - rank_coef}
+  return {"system": name, "result": "single",
+          "solution": {var: float(solution[variables[var]])
+                       for var in sorted(variables.keys())}}
+
+
+def read_batch(path):
+  """
+  This generator yields systems of batch
+
+  Each file of directory is a system, otherwise the file contains systems
+  separated by empty lines.
+
+  Yields: name of system (file name or file:line), list of its lines
+  """
+  if os.path.isdir(path):
+    for name in sorted(os.listdir(path)):
+      filename = os.path.join(path, name)
+      if os.path.isfile(filename):
+        with open(filename, 'r', encoding='utf-8') as file:
+          yield filename, file.readlines()
+    return
+
+  with open(path, 'r', encoding='utf-8') as file:
+    lines = []
+    for number, line in enumerate(file, 1):
+      if line.strip():
+        if not lines:
+          start = number
+        lines.append(line)
+      elif lines:
+        yield "{}:{}".format(path, start), lines
+        lines = []
+    if lines:
+      yield "{}:{}".format(path, start), lines
+
+
+def parse_system(system):
+  """
+  This function parses system of batch, it runs in worker process
+
+  Returns: name, variables and arrays of read_system with key of coefficient
+  matrix, systems with equal key share the matrix
+  """
+  name, lines = system
+  parsed = read_system(lines)
+  variables, rows, cols, coefs = parsed[:4]
+  key = (tuple(variables), len(parsed[4]), rows.tobytes(), cols.tobytes(),
+         coefs.tobytes())
+  return name, key, parsed
+
+
+def solve_group(args):
+  """
+  This function solves systems sharing coefficient matrix with one
+  factorization, it runs in worker process
+
+  Returns: list of result records, error records for systems without any
+  valid equation (nothing is factorized for them) or too large to be solved
+  """
+  mode, systems = args
+  variables, rows, cols, coefs, constants = systems[0][1]
+  if not len(constants):
+    return [{"system": name, "result": "error", "error": "No valid equation"}
+            for name, _ in systems]
+  try:
+    solver = make_solver(mode, (len(constants), len(variables)), rows, cols,
+                         coefs)
+  except ValueError as ve:
+    return [{"system": name, "result": "error", "error": str(ve)}
+            for name, _ in systems]
+  return [result_record(name, variables, *solver.solve(parsed[4]))
+          for name, parsed in systems]
+
+
+def solve_batch(path, mode, jobs, stream):
+  """
+  This function solves all systems of batch and writes results as JSON Lines
+
+  Systems are parsed and grouped by coefficient matrix, every group is
+  factorized once. Parsing and solving of groups is distributed over pool
+  of jobs processes.
+
+  Returns: number of systems and number of factorizations
+  """
+  groups = {}
+  with multiprocessing.Pool(jobs) as pool:
+    for name, key, parsed in pool.imap(parse_system, read_batch(path),
+                                       BATCH_CHUNK):
+      groups.setdefault(key, []).append((name, parsed))
+
+    tasks = [(mode, systems) for systems in groups.values()]
+    count = 0
+    for records in pool.imap(solve_group, tasks, BATCH_CHUNK):
+      for record in records:
+        stream.write(json.dumps(record) + "\n")
+      count += len(records)
+
+  return count, len(groups)
+
+
+if __name__ == "__main__":
+  FILENAME, VERBOSE, MODE, BATCH, JOBS = parse_args()
+
+  if BATCH:
+    SYSTEMS, FACTORIZATIONS = solve_batch(FILENAME, MODE, JOBS, sys.stdout)
+    verbose_print("Solved {} systems with {} factorizations".format(
+      SYSTEMS, FACTORIZATIONS))
+  else:
+    with open(FILENAME, 'r', encoding='utf-8') as FILE:
+      variables, rows, cols, coefs, constants = read_system(FILE)
+
+    verbose_print(*variables.keys())
+    try:
+      solver = make_solver(MODE, (len(constants), len(variables)), rows, cols,
+                           coefs)
+    except ValueError as ve:
+      eprint(ve)
+      exit(1)
+    print_result(variables, *solver.solve(constants))
@@ -0,0 +1,89 @@
+#! python3
+
+"""
+This script generates file with random sparse system of equations
+Each equation touches few variables, system has a single integer solution
+"""
+import sys
+import random
+import argparse
+
+
+def eprint(*args, **kwargs):
+  "This function prints message to error output"
+  print(*args, file=sys.stderr, **kwargs)
+
+
+def parse_args():
+  "This function parses command-line arguments and does basic checks"
+  parser = argparse.ArgumentParser()
+  parser.add_argument("variables", type=int, help="Number of variables")
+  parser.add_argument("-e", "--equations", type=int,
+                      help="Number of equations, number of variables by default")
+  parser.add_argument("-t", "--terms", type=int, default=4,
+                      help="Number of variables in each equation")
+  parser.add_argument("-b", "--band", type=int, default=0,
+                      help="Maximal distance of variable indexes in equation "
+                      "from equation index, 0 for no limit")
+  parser.add_argument("-s", "--seed", type=int, default=0,
+                      help="Seed of random generator")
+
+  args = parser.parse_args()
+
+  if args.variables < 1 or args.terms < 1:
+    eprint("Number of variables and terms has to be positive")
+    exit(2)
+
+  if args.band < 0:
+    eprint("Band can't be negative")
+    exit(2)
+
+  if args.equations is None:
+    args.equations = args.variables
+
+  return (args.variables, args.equations, min(args.terms, args.variables),
+          args.band, args.seed)
+
+
+def variable_name(idx):
+  "This function returns name of variable with given index (a, b, .., aa, ..)"
+  name = ""
+  idx += 1
+  while idx:
+    idx, rest = divmod(idx - 1, 26)
+    name = chr(ord('a') + rest) + name
+  return name
+
+
+def generate(variables, equations, terms, band, rnd):
+  """
+  This generator yields lines of equations
+
+  Equation i touches variable i modulo number of variables with dominant
+  coefficient, so a square system is regular. Other variables are chosen
+  from the band around it, or from all variables if band is 0. Coefficients
+  and solution are positive, so constants are natural numbers.
+  """
+  names = [variable_name(idx) for idx in range(variables)]
+  solution = [rnd.randint(1, 9) for _ in range(variables)]
+
+  for row in range(equations):
+    diagonal = row % variables
+    if band:
+      low = max(min(diagonal - band, variables - 2 * band - 1), 0)
+      others = rnd.sample(range(low, min(low + 2 * band + 1, variables)),
+                          min(terms, 2 * band + 1, variables))
+    else:
+      others = rnd.sample(range(variables), terms)
+    coefs = {idx: rnd.randint(1, 9) for idx in others if idx != diagonal}
+    coefs[diagonal] = 10 * terms
+    constant = sum(coef * solution[idx] for idx, coef in coefs.items())
+    left = " + ".join("{}{}".format(coef, names[idx])
+                      for idx, coef in coefs.items())
+    yield "{} = {}\n".format(left, constant)
+
+
+#script body
+VARIABLES, EQUATIONS, TERMS, BAND, SEED = parse_args()
+sys.stdout.writelines(generate(VARIABLES, EQUATIONS, TERMS, BAND,
+                               random.Random(SEED)))